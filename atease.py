@@ -1,6 +1,15 @@
 import json
 import sqlite3
-from datetime import datetime
+import argparse
+import base64
+import csv
+import glob
+import gzip
+import queue
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date as Date, datetime, timedelta
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
 from tkinter.font import Font
@@ -8,6 +17,7 @@ import hashlib
 import os
 import cv2
 import face_recognition
+import numpy as np
 import pickle
 import geocoder
 
@@ -75,13 +85,899 @@ class ModernFrame(ttk.Frame):
         
         self.configure(style='Modern.TFrame')
 
+class FaceBackend:
+    # Detection returns face_recognition style (top, right, bottom, left) boxes
+    name = None
+    tolerance = 0.6
+
+    def detect(self, rgb_frame):
+        raise NotImplementedError
+
+    def encode(self, rgb_frame, face_locations):
+        raise NotImplementedError
+
+    def locate_and_encode(self, rgb_frame):
+        face_locations = self.detect(rgb_frame)
+        if not face_locations:
+            return [], []
+        return face_locations, self.encode(rgb_frame, face_locations)
+
+    def matches(self, known_encoding, face_encoding):
+        return face_recognition.compare_faces([known_encoding], face_encoding, tolerance=self.tolerance)[0]
+
+class DlibHogBackend(FaceBackend):
+    name = "dlib-hog"
+    detector_model = "hog"
+
+    def __init__(self, upsample=1, num_jitters=1, landmark_model="large"):
+        self.upsample = upsample
+        self.num_jitters = num_jitters
+        self.landmark_model = landmark_model
+
+    def detect(self, rgb_frame):
+        return face_recognition.face_locations(rgb_frame,
+                                               number_of_times_to_upsample=self.upsample,
+                                               model=self.detector_model)
+
+    def encode(self, rgb_frame, face_locations):
+        return face_recognition.face_encodings(rgb_frame, face_locations,
+                                               num_jitters=self.num_jitters,
+                                               model=self.landmark_model)
+
+class DlibCnnBackend(DlibHogBackend):
+    name = "dlib-cnn"
+    detector_model = "cnn"
+
+class OpenCVHaarBackend(DlibHogBackend):
+    # Haar cascade on a downscaled grey frame finds faces cheaply; dlib then
+    # only runs the encoder, with the 5-point landmark model.
+    name = "opencv-haar"
+
+    def __init__(self, scale=0.5, min_size=40, num_jitters=1, landmark_model="small"):
+        super().__init__(num_jitters=num_jitters, landmark_model=landmark_model)
+        self.scale = scale
+        self.min_size = min_size
+        self.cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+        if self.cascade.empty():
+            raise RuntimeError("OpenCV Haar cascade for frontal faces not found")
+
+    def detect(self, rgb_frame):
+        gray = cv2.cvtColor(rgb_frame, cv2.COLOR_RGB2GRAY)
+        small = cv2.resize(gray, None, fx=self.scale, fy=self.scale)
+        min_size = max(int(self.min_size * self.scale), 1)
+        faces = self.cascade.detectMultiScale(small, scaleFactor=1.1, minNeighbors=5,
+                                              minSize=(min_size, min_size))
+        return [(int(y / self.scale), int((x + w) / self.scale), int((y + h) / self.scale), int(x / self.scale))
+                for (x, y, w, h) in faces]
+
+class OpenCVDnnBackend(DlibHogBackend):
+    # OpenCV's ResNet-10 SSD face detector; model files are not bundled
+    name = "opencv-dnn"
+
+    def __init__(self, model_dir="models", confidence=0.6, num_jitters=1, landmark_model="small"):
+        super().__init__(num_jitters=num_jitters, landmark_model=landmark_model)
+        prototxt = os.path.join(model_dir, "deploy.prototxt")
+        weights = os.path.join(model_dir, "res10_300x300_ssd_iter_140000.caffemodel")
+        if not os.path.exists(prototxt) or not os.path.exists(weights):
+            raise RuntimeError(f"OpenCV DNN face detector model files not found in {model_dir}")
+        self.net = cv2.dnn.readNetFromCaffe(prototxt, weights)
+        self.confidence = confidence
+
+    def detect(self, rgb_frame):
+        height, width = rgb_frame.shape[:2]
+        bgr_frame = cv2.cvtColor(rgb_frame, cv2.COLOR_RGB2BGR)
+        blob = cv2.dnn.blobFromImage(cv2.resize(bgr_frame, (300, 300)), 1.0, (300, 300), (104.0, 177.0, 123.0))
+        self.net.setInput(blob)
+        detections = self.net.forward()
+
+        face_locations = []
+        for i in range(detections.shape[2]):
+            if detections[0, 0, i, 2] < self.confidence:
+                continue
+            left, top, right, bottom = (detections[0, 0, i, 3:7] * [width, height, width, height]).astype(int)
+            top, left = max(int(top), 0), max(int(left), 0)
+            bottom, right = min(int(bottom), height), min(int(right), width)
+            if bottom > top and right > left:
+                face_locations.append((top, right, bottom, left))
+        return face_locations
+
+FACE_BACKENDS = {
+    DlibHogBackend.name: DlibHogBackend,
+    DlibCnnBackend.name: DlibCnnBackend,
+    OpenCVHaarBackend.name: OpenCVHaarBackend,
+    OpenCVDnnBackend.name: OpenCVDnnBackend
+}
+
+DEFAULT_FACE_BACKEND = os.environ.get("ATTEASE_FACE_BACKEND", DlibHogBackend.name)
+
+# Two enrolments closer than this are treated as the same person; the
+# active backend's match tolerance is used instead when it is looser
+DUPLICATE_FACE_TOLERANCE = 0.6
+
+# Stored registration crops, kept so encodings can be regenerated for a new model
+FACE_CROP_MAX_SIDE = 160
+FACE_CROP_QUALITY = 85
+MAX_FACE_SAMPLES = 3
+
+_face_backends = {}
+
+def get_face_backend(name=None):
+    name = name or DEFAULT_FACE_BACKEND
+    if name not in FACE_BACKENDS:
+        raise ValueError(f"Unknown face backend '{name}'. Available: {', '.join(FACE_BACKENDS)}")
+    if name not in _face_backends:
+        _face_backends[name] = FACE_BACKENDS[name]()
+    return _face_backends[name]
+
+def load_benchmark_images(image_dir):
+    # Layout: image_dir/<person>/<image>; the first image per person (sorted)
+    # is the enrolment sample, the rest are probes.
+    people = {}
+    for person in sorted(os.listdir(image_dir)):
+        person_dir = os.path.join(image_dir, person)
+        if not os.path.isdir(person_dir):
+            continue
+        images = [os.path.join(person_dir, name) for name in sorted(os.listdir(person_dir))
+                  if name.lower().endswith((".jpg", ".jpeg", ".png"))]
+        if len(images) >= 2:
+            people[person] = images
+    return people
+
+def benchmark_face_backend(backend, people):
+    gallery_labels = []
+    gallery_encodings = []
+    for person, images in people.items():
+        _, encodings = backend.locate_and_encode(face_recognition.load_image_file(images[0]))
+        if encodings:
+            gallery_labels.append(person)
+            gallery_encodings.append(encodings[0])
+
+    latencies = []
+    detected = 0
+    correct = 0
+    for person, images in people.items():
+        for path in images[1:]:
+            rgb_frame = face_recognition.load_image_file(path)
+            start = time.perf_counter()
+            _, encodings = backend.locate_and_encode(rgb_frame)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if not encodings:
+                continue
+            detected += 1
+            if gallery_encodings:
+                distances = face_recognition.face_distance(gallery_encodings, encodings[0])
+                best = int(np.argmin(distances))
+                if distances[best] <= backend.tolerance and gallery_labels[best] == person:
+                    correct += 1
+
+    frames = len(latencies)
+    return {
+        "backend": backend.name,
+        "enrolled": len(gallery_encodings),
+        "frames": frames,
+        "mean_ms": float(np.mean(latencies)) if frames else 0.0,
+        "p95_ms": float(np.percentile(latencies, 95)) if frames else 0.0,
+        "detection_rate": detected / frames if frames else 0.0,
+        "accuracy": correct / frames if frames else 0.0
+    }
+
+class FrameSource:
+    # Same read()/isOpened()/release() contract as cv2.VideoCapture, BGR frames
+    def isOpened(self):
+        return True
+
+    def read(self):
+        raise NotImplementedError
+
+    def release(self):
+        pass
+
+class CameraSource(FrameSource):
+    def __init__(self, index=0):
+        self.capture = cv2.VideoCapture(index)
+
+    def isOpened(self):
+        return self.capture.isOpened()
+
+    def read(self):
+        return self.capture.read()
+
+    def release(self):
+        self.capture.release()
+
+class VideoFileSource(CameraSource):
+    def __init__(self, path):
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"Video file not found: {path}")
+        self.capture = cv2.VideoCapture(path)
+
+class ImageDirectorySource(FrameSource):
+    def __init__(self, directory, loop=False):
+        self.paths = [os.path.join(directory, name) for name in sorted(os.listdir(directory))
+                      if name.lower().endswith((".jpg", ".jpeg", ".png", ".bmp"))]
+        self.loop = loop
+        self.position = 0
+
+    def isOpened(self):
+        return bool(self.paths)
+
+    def read(self):
+        while self.paths:
+            if self.position >= len(self.paths):
+                if not self.loop:
+                    return False, None
+                self.position = 0
+            path = self.paths[self.position]
+            self.position += 1
+            frame = cv2.imread(path)
+            if frame is not None:
+                return True, frame
+            print(f"Skipping unreadable image: {path}")
+        return False, None
+
+class SyntheticSource(FrameSource):
+    # Deterministic noise frames with a moving bright ellipse, for
+    # throughput runs where no camera or footage is available.
+    def __init__(self, count=300, width=640, height=480, seed=0):
+        self.count = count
+        self.width = width
+        self.height = height
+        self.rng = np.random.default_rng(seed)
+        self.position = 0
+
+    def read(self):
+        if self.position >= self.count:
+            return False, None
+        frame = self.rng.integers(0, 64, size=(self.height, self.width, 3), dtype=np.uint8)
+        center = (int(self.width / 2 + self.width / 4 * np.sin(self.position / 15)), self.height // 2)
+        cv2.ellipse(frame, center, (self.width // 8, self.height // 5), 0, 0, 360, (180, 190, 220), -1)
+        self.position += 1
+        return True, frame
+
+class DisplaySink:
+    interactive = True
+
+    def __init__(self, title, width=640, height=480):
+        self.title = title
+        cv2.namedWindow(title, cv2.WINDOW_NORMAL)
+        cv2.resizeWindow(title, width, height)
+
+    def show(self, frame):
+        # False once the user presses q
+        cv2.imshow(self.title, frame)
+        return cv2.waitKey(1) & 0xFF != ord('q')
+
+    def close(self):
+        cv2.destroyAllWindows()
+
+class HeadlessSink:
+    # Nobody can press q, so callers that must finish pass a frame or time limit
+    interactive = False
+
+    def __init__(self, max_frames=None, timeout=None):
+        self.max_frames = max_frames
+        self.deadline = time.monotonic() + timeout if timeout is not None else None
+        self.frames = 0
+
+    def show(self, frame):
+        self.frames += 1
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            return False
+        return self.max_frames is None or self.frames < self.max_frames
+
+    def close(self):
+        pass
+
+# Seconds a headless capture or verification dialog waits for a face
+HEADLESS_DIALOG_TIMEOUT = float(os.environ.get("ATTEASE_HEADLESS_TIMEOUT", "15"))
+
+def open_frame_source(spec=None):
+    # "0"/"1" camera index, "synthetic[:N]", an image directory or a video file
+    spec = spec or os.environ.get("ATTEASE_FRAME_SOURCE", "0")
+    if spec.isdigit():
+        return CameraSource(int(spec))
+    if spec.startswith("synthetic"):
+        _, _, count = spec.partition(":")
+        return SyntheticSource(int(count) if count else 300)
+    if os.path.isdir(spec):
+        return ImageDirectorySource(spec)
+    return VideoFileSource(spec)
+
+def open_display_sink(title, timeout=None):
+    # timeout only applies headless; a preview window is closed with q
+    if os.environ.get("ATTEASE_HEADLESS"):
+        return HeadlessSink(timeout=timeout)
+    return DisplaySink(title)
+
+def make_face_crop(rgb_frame, face_location, margin=0.25, max_side=FACE_CROP_MAX_SIDE, quality=FACE_CROP_QUALITY):
+    # JPEG of the face plus some context, downscaled so every sample stays small
+    top, right, bottom, left = face_location
+    pad_y = int((bottom - top) * margin)
+    pad_x = int((right - left) * margin)
+    height, width = rgb_frame.shape[:2]
+    crop = rgb_frame[max(top - pad_y, 0):min(bottom + pad_y, height), max(left - pad_x, 0):min(right + pad_x, width)]
+    scale = max_side / max(crop.shape[:2])
+    if scale < 1:
+        crop = cv2.resize(crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    ok, data = cv2.imencode(".jpg", cv2.cvtColor(crop, cv2.COLOR_RGB2BGR), [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("Failed to encode face crop")
+    return data.tobytes()
+
+def encode_face_crop(crop, model_id):
+    rgb_frame = cv2.cvtColor(cv2.imdecode(np.frombuffer(crop, dtype=np.uint8), cv2.IMREAD_COLOR), cv2.COLOR_BGR2RGB)
+    backend = get_face_backend(model_id)
+    face_locations = backend.detect(rgb_frame)
+    if not face_locations:
+        # The crop is already centred on the face
+        height, width = rgb_frame.shape[:2]
+        face_locations = [(0, width, height, 0)]
+    return backend.encode(rgb_frame, face_locations[:1])[0]
+
+def _reencode_worker(job):
+    # Runs in a worker process; returns (enrollment_number, pickled encoding or None, error)
+    enrollment_number, crop, model_id = job
+    try:
+        return enrollment_number, pickle.dumps(encode_face_crop(crop, model_id)), None
+    except Exception as e:
+        return enrollment_number, None, str(e)
+
+def capture_face_encoding(source, sink, backend, stop_when_found=False):
+    # Returns (encoding, JPEG face crop) from the last frame with a face, or (None, None)
+    face_encoding = None
+    face_crop = None
+    while True:
+        ret, frame = source.read()
+        if not ret:
+            break
+
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        face_locations = backend.detect(rgb_frame)
+
+        if face_locations:
+            top, right, bottom, left = face_locations[0]
+            face_encoding = backend.encode(rgb_frame, face_locations[:1])[0]
+            face_crop = make_face_crop(rgb_frame, face_locations[0])
+            cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
+
+        if not sink.show(frame) or (stop_when_found and face_encoding is not None):
+            break
+    return face_encoding, face_crop
+
+def verify_face(source, sink, backend, stored_encoding):
+    while True:
+        ret, frame = source.read()
+        if not ret:
+            return False
+
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        face_locations = backend.detect(rgb_frame)
+
+        if face_locations:
+            top, right, bottom, left = face_locations[0]
+            cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
+
+            current_face_encoding = backend.encode(rgb_frame, face_locations[:1])[0]
+
+            if backend.matches(stored_encoding, current_face_encoding):
+                cv2.putText(frame, "Face Verified", (left, top - 10),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+                return True
+            cv2.putText(frame, "Face Not Recognized", (left, top - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
+
+        if not sink.show(frame):
+            return False
+
+def identify_faces(source, sink, backend, gallery, hostel, on_match, cross_hostel=False, cooldown=30.0,
+                   reload_interval=5.0, active_model=None):
+    # on_match(enrollment_number, home_hostel) fires at most once per cooldown per student
+    home_key = gallery.partition_key(hostel)
+    last_seen = {}
+    last_reload = time.monotonic()
+    while True:
+        ret, frame = source.read()
+        if not ret:
+            break
+
+        if time.monotonic() - last_reload >= reload_interval:
+            # Students registered or synced since the kiosk started, and a
+            # model switch (active_model returns the current model name)
+            if active_model is not None:
+                model_id = active_model()
+                if model_id != backend.name:
+                    print(f"Switching face model to {model_id}")
+                    backend = get_face_backend(model_id)
+            gallery.refresh(hostel)
+            last_reload = time.monotonic()
+
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        face_locations, encodings = backend.locate_and_encode(rgb_frame)
+        for (top, right, bottom, left), encoding in zip(face_locations, encodings):
+            match = gallery.identify(encoding, hostel, tolerance=backend.tolerance, cross_hostel=cross_hostel)
+            if match is None:
+                label, color = "Unknown", (0, 0, 255)
+            else:
+                enrollment_number, distance, key = match
+                label = enrollment_number if key == home_key else f"{enrollment_number} (other hostel)"
+                color = (0, 255, 0) if key == home_key else (0, 165, 255)
+                now = time.monotonic()
+                if now - last_seen.get(enrollment_number, -cooldown) >= cooldown:
+                    last_seen[enrollment_number] = now
+                    on_match(enrollment_number, key == home_key)
+            cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
+            cv2.putText(frame, label, (left, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+
+        if not sink.show(frame):
+            break
+
+def measure_throughput(source, backend, max_frames=None):
+    latencies = []
+    faces = 0
+    started = time.perf_counter()
+    while max_frames is None or len(latencies) < max_frames:
+        ret, frame = source.read()
+        if not ret:
+            break
+        start = time.perf_counter()
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        face_locations, _ = backend.locate_and_encode(rgb_frame)
+        latencies.append((time.perf_counter() - start) * 1000)
+        faces += bool(face_locations)
+    elapsed = time.perf_counter() - started
+
+    frames = len(latencies)
+    return {
+        "frames": frames,
+        "frames_with_faces": faces,
+        "seconds": elapsed,
+        "fps": frames / elapsed if elapsed else 0.0,
+        "mean_ms": float(np.mean(latencies)) if frames else 0.0,
+        "p95_ms": float(np.percentile(latencies, 95)) if frames else 0.0
+    }
+
+class AttendanceMatrix:
+    # One bit per student per day, packed little-endian into uint64 words.
+    # Bit d of a row is day `origin + d`; rows follow `enrollment_numbers`.
+    def __init__(self, enrollment_numbers, hostels, origin, num_days=64):
+        self.enrollment_numbers = list(enrollment_numbers)
+        self.index = {number: i for i, number in enumerate(self.enrollment_numbers)}
+        self.hostels = list(hostels)
+        self.origin = origin
+        self.active = np.ones(len(self.enrollment_numbers), dtype=bool)
+        self.words = np.zeros((len(self.enrollment_numbers), max((num_days + 63) // 64, 1)), dtype=np.uint64)
+        self.last_id = 0
+
+    @staticmethod
+    def _parse_date(value):
+        return datetime.strptime(value, "%Y-%m-%d").date() if isinstance(value, str) else value
+
+    @classmethod
+    def from_tracker(cls, tracker, start_date=None):
+        students = tracker.conn.execute('''
+        SELECT enrollment_number, hostel_location FROM students WHERE active = 1 ORDER BY enrollment_number
+        ''').fetchall()
+        records = tracker.query_attendance(start_date=start_date)
+        if start_date:
+            origin = cls._parse_date(start_date)
+        elif records:
+            origin = cls._parse_date(records[0][1])
+        else:
+            origin = datetime.now().date()
+
+        matrix = cls([row[0] for row in students], [row[1] or "" for row in students], origin)
+        matrix.set_many(records)
+        matrix.last_id = tracker.conn.execute('SELECT COALESCE(MAX(id), 0) FROM attendance').fetchone()[0]
+        return matrix
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            matrix = cls(data["enrollment_numbers"].tolist(), data["hostels"].tolist(),
+                         cls._parse_date(str(data["origin"])))
+            matrix.words = data["words"].astype(np.uint64)
+            matrix.active = data["active"].astype(bool)
+            matrix.last_id = int(data["last_id"])
+        return matrix
+
+    def save(self, path):
+        tmp_path = path + ".tmp.npz"
+        np.savez_compressed(tmp_path,
+                            words=self.words,
+                            enrollment_numbers=np.array(self.enrollment_numbers, dtype=str),
+                            hostels=np.array(self.hostels, dtype=str),
+                            active=self.active,
+                            origin=np.array(self.origin.isoformat()),
+                            last_id=np.array(self.last_id))
+        os.replace(tmp_path, path)
+
+    def sync_students(self, tracker):
+        students = tracker.conn.execute('''
+        SELECT enrollment_number, hostel_location FROM students WHERE active = 1
+        ''').fetchall()
+        current = {row[0] for row in students}
+        self.remove_students([number for number in self.enrollment_numbers if number not in current])
+        for enrollment_number, hostel in students:
+            self.add_student(enrollment_number, hostel)
+
+    def refresh(self, tracker):
+        # Catch up with rows written since the matrix was built or saved
+        cursor = tracker.conn.execute('''
+        SELECT id, enrollment_number, date FROM attendance WHERE id > ? ORDER BY id
+        ''', (self.last_id,))
+        rows = cursor.fetchall()
+        if rows:
+            self.set_many([(row[1], row[2]) for row in rows])
+            self.last_id = rows[-1][0]
+        return len(rows)
+
+    def day_index(self, value):
+        return (self._parse_date(value) - self.origin).days
+
+    def _day_indexes(self, values):
+        return (np.array(values, dtype="datetime64[D]")
+                - np.datetime64(self.origin.isoformat(), "D")).astype(np.int64)
+
+    def _ensure_days(self, start_value, end_value):
+        first_day, last_day = self.day_index(start_value), self.day_index(end_value)
+        if first_day < 0:
+            # Prepend whole words so existing bit positions keep their meaning
+            extra = (-first_day + 63) // 64
+            padding = np.zeros((self.words.shape[0], extra), dtype=np.uint64)
+            self.words = np.concatenate([padding, self.words], axis=1)
+            self.origin -= timedelta(days=64 * extra)
+            last_day += 64 * extra
+        needed = last_day // 64 + 1
+        if needed > self.words.shape[1]:
+            grow = max(needed, self.words.shape[1] * 2) - self.words.shape[1]
+            padding = np.zeros((self.words.shape[0], grow), dtype=np.uint64)
+            self.words = np.concatenate([self.words, padding], axis=1)
+
+    def add_student(self, enrollment_number, hostel):
+        if enrollment_number in self.index:
+            self.active[self.index[enrollment_number]] = True
+            return
+        self.index[enrollment_number] = len(self.enrollment_numbers)
+        self.enrollment_numbers.append(enrollment_number)
+        self.hostels.append(hostel or "")
+        self.active = np.append(self.active, True)
+        self.words = np.vstack([self.words, np.zeros((1, self.words.shape[1]), dtype=np.uint64)])
+
+    def remove_students(self, enrollment_numbers):
+        for number in enrollment_numbers:
+            if number in self.index:
+                self.active[self.index[number]] = False
+
+    def set_many(self, records):
+        records = [(number, value) for number, value in records if number in self.index]
+        if not records:
+            return
+        values = [value for _, value in records]
+        self._ensure_days(min(values), max(values))
+        rows = np.array([self.index[number] for number, _ in records], dtype=np.int64)
+        days = self._day_indexes(values)
+        bits = np.left_shift(np.uint64(1), (days & 63).astype(np.uint64))
+        np.bitwise_or.at(self.words, (rows, days >> 6), bits)
+
+    def mark(self, enrollment_number, value):
+        self.set_many([(enrollment_number, value)])
+
+    def _range_mask(self, first_day, last_day):
+        # Per-word mask with the bits for days first_day..last_day set
+        mask = np.zeros(self.words.shape[1], dtype=np.uint64)
+        for word in range(first_day // 64, last_day // 64 + 1):
+            low = max(first_day - word * 64, 0)
+            high = min(last_day - word * 64, 63)
+            mask[word] = np.uint64(((1 << (high - low + 1)) - 1) << low)
+        return mask
+
+    def _selection(self, hostel=None):
+        selected = self.active.copy()
+        if hostel is not None:
+            selected &= np.array([h.lower() == hostel.lower() for h in self.hostels], dtype=bool)
+        return selected
+
+    def _present_between(self, start_value, end_value):
+        self._ensure_days(start_value, end_value)
+        first_day, last_day = self.day_index(start_value), self.day_index(end_value)
+        first_word = first_day // 64
+        words = self.words[:, first_word:last_day // 64 + 1]
+        unpacked = np.unpackbits(words.astype("<u8").view(np.uint8), axis=1, bitorder="little")
+        offset = first_day - first_word * 64
+        return unpacked[:, offset:offset + last_day - first_day + 1].astype(bool)
+
+    def present_on(self, value):
+        self._ensure_days(value, value)
+        day = self.day_index(value)
+        return ((self.words[:, day >> 6] >> np.uint64(day & 63)) & np.uint64(1)).astype(bool)
+
+    def absentees(self, value, hostel=None):
+        missing = self._selection(hostel) & ~self.present_on(value)
+        return [self.enrollment_numbers[i] for i in np.flatnonzero(missing)]
+
+    def absent_throughout(self, start_value, end_value, hostel=None):
+        # Students with no attendance bit anywhere in the range
+        self._ensure_days(start_value, end_value)
+        mask = self._range_mask(self.day_index(start_value), self.day_index(end_value))
+        seen = ((self.words & mask) != 0).any(axis=1)
+        missing = self._selection(hostel) & ~seen
+        return [self.enrollment_numbers[i] for i in np.flatnonzero(missing)]
+
+    def longest_absence_streaks(self, start_value, end_value):
+        # Longest run of absent days per student, one vector step per day
+        present = self._present_between(start_value, end_value)
+        current = np.zeros(present.shape[0], dtype=np.int64)
+        longest = np.zeros(present.shape[0], dtype=np.int64)
+        for column in range(present.shape[1]):
+            current = np.where(present[:, column], 0, current + 1)
+            np.maximum(longest, current, out=longest)
+        return longest
+
+    def consecutive_absentees(self, nights, start_value, end_value, hostel=None):
+        longest = self.longest_absence_streaks(start_value, end_value)
+        hits = self._selection(hostel) & (longest >= nights)
+        return [(self.enrollment_numbers[i], int(longest[i])) for i in np.flatnonzero(hits)]
+
+    def daily_counts(self, start_value, end_value, hostel=None):
+        present = self._present_between(start_value, end_value)
+        return present[self._selection(hostel)].sum(axis=0)
+
+    def heatmap(self, start_value, end_value):
+        return {hostel: self.daily_counts(start_value, end_value, hostel)
+                for hostel in sorted(set(self.hostels)) if hostel}
+
+class FaceGallery:
+    # Face encodings partitioned by hostel, both in memory and on disk as one
+    # .npz file per hostel, so a gate kiosk only loads and searches its own.
+    def __init__(self, directory=os.path.join('database', 'gallery')):
+        self.directory = directory
+        self.partitions = {}
+        self.mtimes = {}
+        self.other_partitions = {}
+
+    @staticmethod
+    def partition_key(hostel):
+        return " ".join((hostel or "").lower().split())
+
+    def _path(self, key):
+        slug = "".join(ch if ch.isalnum() else "_" for ch in key)[:40].strip("_") or "unknown"
+        digest = hashlib.sha1(key.encode()).hexdigest()[:8]
+        return os.path.join(self.directory, f"{slug}-{digest}.npz")
+
+    def _save(self, key, enrollment_numbers, encodings):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path,
+                 key=np.array(key),
+                 enrollment_numbers=np.array(enrollment_numbers, dtype=str),
+                 encodings=encodings)
+        os.replace(tmp_path, path)
+        self.mtimes[key] = os.stat(path).st_mtime_ns
+
+    def _read(self, path):
+        with np.load(path, allow_pickle=False) as data:
+            return str(data["key"]), data["enrollment_numbers"].tolist(), data["encodings"]
+
+    def _read_cached(self, path):
+        # Cross-hostel fallback runs for every unknown face on every frame, so
+        # other partitions are kept in memory until their file changes
+        mtime = os.stat(path).st_mtime_ns
+        cached = self.other_partitions.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, self._read(path))
+            self.other_partitions[path] = cached
+        return cached[1]
+
+    @staticmethod
+    def _student_rows(tracker, hostel=None):
+        query = '''
+        SELECT enrollment_number, hostel_location, face_encoding FROM students
+        WHERE active = 1 AND face_encoding IS NOT NULL
+        '''
+        cursor = tracker.conn.execute(query)
+        for enrollment_number, hostel_location, face_encoding in cursor:
+            if hostel is None or FaceGallery.partition_key(hostel_location) == FaceGallery.partition_key(hostel):
+                yield enrollment_number, hostel_location, pickle.loads(bytes(face_encoding))
+
+    def rebuild(self, tracker):
+        grouped = {}
+        for enrollment_number, hostel_location, encoding in self._student_rows(tracker):
+            numbers, encodings = grouped.setdefault(self.partition_key(hostel_location), ([], []))
+            numbers.append(enrollment_number)
+            encodings.append(encoding)
+
+        os.makedirs(self.directory, exist_ok=True)
+        for path in glob.glob(os.path.join(self.directory, "*.npz")):
+            os.remove(path)
+        self.partitions = {}
+        for key, (numbers, encodings) in grouped.items():
+            self.partitions[key] = (numbers, np.asarray(encodings, dtype=np.float64).reshape(len(numbers), -1))
+            self._save(key, *self.partitions[key])
+        return {key: len(numbers) for key, (numbers, _) in grouped.items()}
+
+    def load(self, hostel, tracker=None):
+        key = self.partition_key(hostel)
+        path = self._path(key)
+        if os.path.exists(path):
+            mtime = os.stat(path).st_mtime_ns
+            _, numbers, encodings = self._read(path)
+            self.partitions[key] = (numbers, encodings)
+            self.mtimes[key] = mtime
+        elif tracker is not None:
+            rows = list(self._student_rows(tracker, hostel))
+            encodings = np.asarray([row[2] for row in rows], dtype=np.float64) if rows else np.zeros((0, 128))
+            self.partitions[key] = ([row[0] for row in rows], encodings)
+            self._save(key, *self.partitions[key])
+        else:
+            self.partitions[key] = ([], np.zeros((0, 128)))
+        return len(self.partitions[key][0])
+
+    def ensure_partitions(self, tracker):
+        # Kiosks only write their own hostel's file, so build any that are missing
+        cursor = tracker.conn.execute('''
+        SELECT DISTINCT hostel_location FROM students WHERE active = 1 AND face_encoding IS NOT NULL
+        ''')
+        hostels = {}
+        for (hostel,) in cursor.fetchall():
+            hostels.setdefault(self.partition_key(hostel), hostel)
+        for key, hostel in hostels.items():
+            if not os.path.exists(self._path(key)):
+                self.load(hostel, tracker)
+
+    def refresh(self, hostel):
+        # Picks up a partition file rewritten by another process (GUI registration, sync)
+        key = self.partition_key(hostel)
+        try:
+            if os.stat(self._path(key)).st_mtime_ns != self.mtimes.get(key):
+                self.load(hostel)
+                return True
+        except (OSError, ValueError):
+            # Missing or mid-rebuild; keep serving the copy already in memory
+            pass
+        return False
+
+    def add(self, hostel, enrollment_number, encoding, tracker=None):
+        key = self.partition_key(hostel)
+        if key in self.partitions:
+            # Another process may have rewritten the file since it was read
+            self.refresh(hostel)
+        else:
+            if tracker is None and not os.path.exists(self._path(key)):
+                # Never start a partition file from one student; the next
+                # load with a tracker builds it from the database instead.
+                return
+            self.load(hostel, tracker)
+        numbers, encodings = self.partitions[key]
+        encoding = np.asarray(encoding, dtype=np.float64).reshape(1, -1)
+        if enrollment_number in numbers:
+            encodings = encodings.copy()
+            encodings[numbers.index(enrollment_number)] = encoding[0]
+        else:
+            numbers = numbers + [enrollment_number]
+            encodings = np.vstack([encodings.reshape(-1, encoding.shape[1]), encoding])
+        self.partitions[key] = (numbers, encodings)
+        self._save(key, numbers, encodings)
+
+    def remove(self, enrollment_numbers):
+        # Rewrites partition files in place without keeping other hostels in memory
+        removed = set(enrollment_numbers)
+        for path in glob.glob(os.path.join(self.directory, "*.npz")):
+            key, numbers, encodings = self._read(path)
+            keep = [i for i, number in enumerate(numbers) if number not in removed]
+            if len(keep) != len(numbers):
+                numbers, encodings = [numbers[i] for i in keep], encodings[keep]
+                self._save(key, numbers, encodings)
+                if key in self.partitions:
+                    self.partitions[key] = (numbers, encodings)
+
+    @staticmethod
+    def _nearest(numbers, encodings, encoding):
+        if not numbers:
+            return None
+        distances = np.linalg.norm(encodings - np.asarray(encoding), axis=1)
+        best = int(np.argmin(distances))
+        return numbers[best], float(distances[best])
+
+    def nearest_anywhere(self, encoding, exclude=None):
+        # Closest enrolment across every partition, streamed from disk
+        best = None
+        for path in glob.glob(os.path.join(self.directory, "*.npz")):
+            key, numbers, encodings = self._read(path)
+            if exclude is not None and exclude in numbers:
+                keep = [i for i, number in enumerate(numbers) if number != exclude]
+                numbers, encodings = [numbers[i] for i in keep], encodings[keep]
+            match = self._nearest(numbers, encodings, encoding)
+            if match and (best is None or match[1] < best[1]):
+                best = (match[0], match[1], key)
+        return best
+
+    def identify(self, encoding, hostel, tolerance=0.6, cross_hostel=False):
+        # Returns (enrollment_number, distance, hostel key) or None
+        key = self.partition_key(hostel)
+        if key not in self.partitions:
+            self.load(hostel)
+        match = self._nearest(*self.partitions[key], encoding)
+        if match and match[1] <= tolerance:
+            return match[0], match[1], key
+        if not cross_hostel:
+            return None
+
+        best = None
+        for path in glob.glob(os.path.join(self.directory, "*.npz")):
+            if path == self._path(key):
+                continue
+            try:
+                other_key, numbers, encodings = self._read_cached(path)
+            except (OSError, ValueError):
+                # Being rewritten by another process; picked up on a later frame
+                continue
+            other = self._nearest(numbers, encodings, encoding)
+            if other and other[1] <= tolerance and (best is None or other[1] < best[1]):
+                best = (other[0], other[1], other_key)
+        return best
+
+def find_duplicate_pairs(encodings, threshold=DUPLICATE_FACE_TOLERANCE, block_size=2048):
+    # All pairs (distance, i, j), i < j, closer than threshold. Distances are
+    # computed block by block as |a|^2 + |b|^2 - 2ab, so memory stays at
+    # block_size^2 floats however large the gallery is.
+    encodings = np.asarray(encodings, dtype=np.float32)
+    squared_norms = np.einsum("ij,ij->i", encodings, encodings)
+    limit = threshold * threshold
+    pairs = []
+    for i in range(0, len(encodings), block_size):
+        block_i = encodings[i:i + block_size]
+        for j in range(i, len(encodings), block_size):
+            block_j = encodings[j:j + block_size]
+            distances = squared_norms[i:i + block_size, None] + squared_norms[None, j:j + block_size]
+            distances -= 2.0 * (block_i @ block_j.T)
+            if i == j:
+                # Only the upper triangle, without the diagonal
+                distances[np.tril_indices(len(block_i), 0, len(block_j))] = np.inf
+            rows, columns = np.nonzero(distances <= limit)
+            for row, column in zip(rows, columns):
+                pairs.append((float(np.sqrt(max(distances[row, column], 0.0))), i + int(row), j + int(column)))
+    pairs.sort()
+    return pairs
+
+ATTENDANCE_MATRIX_SNAPSHOT = os.path.join('database', 'attendance_matrix.npz')
+
+# attendance.day counts days since 1970-01-01 in local time, so day,
+# week and month reports are integer range scans on the day indexes
+EPOCH_DATE = Date(1970, 1, 1)
+
+def to_day_number(value):
+    if isinstance(value, str):
+        value = datetime.strptime(value, "%Y-%m-%d").date()
+    elif isinstance(value, datetime):
+        value = value.date()
+    return (value - EPOCH_DATE).days
+
+def day_number_to_date(day):
+    return (EPOCH_DATE + timedelta(days=day)).isoformat()
+
+def week_bounds(value):
+    # Monday to Sunday, inclusive
+    day = to_day_number(value)
+    first_day = day - (EPOCH_DATE.weekday() + day) % 7
+    return first_day, first_day + 6
+
+def month_bounds(value):
+    first = (EPOCH_DATE + timedelta(days=to_day_number(value))).replace(day=1)
+    following = (first + timedelta(days=32)).replace(day=1)
+    return to_day_number(first), to_day_number(following) - 1
+
 class AttendanceTracker:
     def __init__(self):
         if not os.path.exists('database'):
             os.makedirs('database')
         
-        self.conn = sqlite3.connect('database/attendance_tracker.db')
+        # One connection for the process lifetime; keep its prepared statements around
+        self.conn = sqlite3.connect('database/attendance_tracker.db', cached_statements=256)
         self.create_tables()
+        self.node_id = self.get_node_id()
+        self.attendance_matrix = None
+        self.face_gallery = FaceGallery()
         
         self.create_default_warden()
 
@@ -125,6 +1021,79 @@ class AttendanceTracker:
                 enrollment_number TEXT,
                 FOREIGN KEY (enrollment_number) REFERENCES students(enrollment_number)
             )''')
+
+            # Append-only log of mutations, keyed by the node that made them
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS changelog (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                node_id TEXT NOT NULL,
+                node_seq INTEGER NOT NULL,
+                table_name TEXT NOT NULL,
+                op TEXT NOT NULL,
+                row_key TEXT NOT NULL,
+                payload TEXT,
+                created_at TEXT NOT NULL,
+                UNIQUE (node_id, node_seq)
+            )''')
+
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS sync_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )''')
+
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS sync_bundles (
+                name TEXT PRIMARY KEY,
+                imported_at TEXT NOT NULL
+            )''')
+
+            # One row per monthly archive file holding closed attendance
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS attendance_partitions (
+                name TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                start_date TEXT NOT NULL,
+                end_date TEXT NOT NULL,
+                row_count INTEGER NOT NULL,
+                archived_at TEXT NOT NULL
+            )''')
+
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS archived_students (
+                enrollment_number TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                room TEXT,
+                hostel_location TEXT,
+                face_encoding BLOB,
+                archived_at TEXT NOT NULL
+            )''')
+
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS face_samples (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                enrollment_number TEXT NOT NULL,
+                crop BLOB NOT NULL,
+                created_at TEXT NOT NULL
+            )''')
+
+            # Encodings per recognition model; students.face_encoding holds the active one
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS face_encodings (
+                enrollment_number TEXT NOT NULL,
+                model_id TEXT NOT NULL,
+                encoding BLOB NOT NULL,
+                created_at TEXT NOT NULL,
+                PRIMARY KEY (enrollment_number, model_id)
+            )''')
+
+            self.add_column_if_missing("students", "active", "INTEGER NOT NULL DEFAULT 1")
+            # day is derived from date; ts (unix seconds) is unknown for rows written before it existed
+            self.add_column_if_missing("attendance", "day", "INTEGER")
+            self.add_column_if_missing("attendance", "ts", "INTEGER")
+            self.conn.execute('''
+            UPDATE attendance SET day = CAST(julianday(date) - 2440587.5 AS INTEGER) WHERE day IS NULL
+            ''')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_face_samples_enrollment ON face_samples (enrollment_number)')
+
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_users_enrollment ON users (enrollment_number)')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_students_hostel ON students (hostel_location)')
+            self.conn.execute('DROP INDEX IF EXISTS idx_attendance_enrollment_date')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_attendance_enrollment_day ON attendance (enrollment_number, day)')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_attendance_day ON attendance (day)')
             
             self.conn.commit()
             self.create_default_warden()
@@ -132,6 +1101,13 @@ class AttendanceTracker:
             print(f"Database error: {e}")
             raise
 
+    def add_column_if_missing(self, table, column, declaration, schema="main"):
+        if not self.has_column(table, column, schema):
+            self.conn.execute(f'ALTER TABLE {schema}.{table} ADD COLUMN {column} {declaration}')
+
+    def has_column(self, table, column, schema="main"):
+        return column in [row[1] for row in self.conn.execute(f'PRAGMA {schema}.table_info({table})')]
+
     def register_user(self, username, password, role, enrollment_number=None):
         if not username or not password or not role:
             return False
@@ -144,6 +1120,12 @@ class AttendanceTracker:
             hashed_password = hashlib.sha256(password.encode()).hexdigest()
             self.conn.execute('INSERT INTO users (username, password, role, enrollment_number) VALUES (?, ?, ?, ?)',
                             (username, hashed_password, role, enrollment_number))
+            self.log_change("users", "upsert", username, {
+                "username": username,
+                "password": hashed_password,
+                "role": role,
+                "enrollment_number": enrollment_number
+            })
             self.conn.commit()
             return True
         except sqlite3.Error as e:
@@ -164,39 +1146,485 @@ class AttendanceTracker:
             print(f"Authentication error: {e}")
             return None
 
-    def register_student(self, enrollment_number, name, room, hostel_location, face_encoding):
+    def duplicate_face_tolerance(self):
+        # Never stricter than the distance the kiosk accepts as a match,
+        # otherwise two enrolments could pass here yet be confused at the gate
+        return max(DUPLICATE_FACE_TOLERANCE, FACE_BACKENDS[self.active_face_model()].tolerance)
+
+    def _inactive_face_rows(self):
+        # Deactivated and archived students are not in the kiosk gallery
+        cursor = self.conn.execute('''
+        SELECT enrollment_number, name, hostel_location, face_encoding FROM students
+        WHERE active = 0 AND face_encoding IS NOT NULL
+        UNION ALL
+        SELECT enrollment_number, name, hostel_location, face_encoding FROM archived_students
+        WHERE face_encoding IS NOT NULL
+          AND enrollment_number NOT IN (SELECT enrollment_number FROM students)
+        ''')
+        return cursor.fetchall()
+
+    def find_duplicate_face(self, face_encoding, exclude=None, tolerance=None):
+        if tolerance is None:
+            tolerance = self.duplicate_face_tolerance()
+        self.face_gallery.ensure_partitions(self)
+        match = self.face_gallery.nearest_anywhere(face_encoding, exclude=exclude)
+
+        numbers = []
+        encodings = []
+        for enrollment_number, _, _, encoding in self._inactive_face_rows():
+            if enrollment_number != exclude:
+                numbers.append(enrollment_number)
+                encodings.append(pickle.loads(bytes(encoding)))
+        if numbers:
+            inactive = FaceGallery._nearest(numbers, np.asarray(encodings, dtype=np.float64), face_encoding)
+            if match is None or inactive[1] < match[1]:
+                match = inactive
+
+        if match and match[1] <= tolerance:
+            return match[0], match[1]
+        return None
+
+    def audit_duplicate_faces(self, threshold=None, block_size=2048, report_path=None):
+        if threshold is None:
+            threshold = self.duplicate_face_tolerance()
+        cursor = self.conn.execute('''
+        SELECT enrollment_number, name, hostel_location, face_encoding FROM students
+        WHERE active = 1 AND face_encoding IS NOT NULL ORDER BY enrollment_number
+        ''')
+        students = []
+        encodings = []
+        for enrollment_number, name, hostel_location, face_encoding in cursor.fetchall() + self._inactive_face_rows():
+            try:
+                encodings.append(np.asarray(pickle.loads(bytes(face_encoding)), dtype=np.float32))
+            except Exception as e:
+                print(f"Skipping unreadable face data for {enrollment_number}: {e}")
+                continue
+            students.append((enrollment_number, name, hostel_location))
+
+        pairs = find_duplicate_pairs(encodings, threshold, block_size) if encodings else []
+        report = [(rank, distance) + students[i] + students[j]
+                  for rank, (distance, i, j) in enumerate(pairs, start=1)]
+
+        if report_path:
+            with open(report_path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(["rank", "distance",
+                                 "enrollment_a", "name_a", "hostel_a",
+                                 "enrollment_b", "name_b", "hostel_b"])
+                for row in report:
+                    writer.writerow([row[0], f"{row[1]:.4f}"] + list(row[2:]))
+        return len(students), report
+
+    def active_face_model(self):
+        return self.get_meta("active_face_model", DEFAULT_FACE_BACKEND)
+
+    def add_face_sample(self, enrollment_number, face_crop):
+        # Caller commits; only the newest MAX_FACE_SAMPLES crops are kept
+        self.conn.execute('''
+        INSERT INTO face_samples (enrollment_number, crop, created_at) VALUES (?, ?, ?)
+        ''', (enrollment_number, sqlite3.Binary(face_crop), datetime.now().isoformat(timespec="seconds")))
+        self.conn.execute('''
+        DELETE FROM face_samples WHERE enrollment_number = ? AND id NOT IN (
+            SELECT id FROM face_samples WHERE enrollment_number = ? ORDER BY id DESC LIMIT ?
+        )
+        ''', (enrollment_number, enrollment_number, MAX_FACE_SAMPLES))
+
+    def reencode_faces(self, model_id, workers=None, checkpoint_every=200):
+        # Resumable: students that already have an encoding for model_id are skipped,
+        # and every batch is committed before the next one starts.
+        if model_id not in FACE_BACKENDS:
+            raise ValueError(f"Unknown face model '{model_id}'")
+        cursor = self.conn.execute('''
+        SELECT s.enrollment_number, fs.crop FROM students s
+        JOIN face_samples fs ON fs.id = (
+            SELECT MAX(id) FROM face_samples WHERE enrollment_number = s.enrollment_number
+        )
+        WHERE NOT EXISTS (
+            SELECT 1 FROM face_encodings fe WHERE fe.enrollment_number = s.enrollment_number AND fe.model_id = ?
+        )
+        ORDER BY s.enrollment_number
+        ''', (model_id,))
+        jobs = [(row[0], bytes(row[1]), model_id) for row in cursor.fetchall()]
+
+        encoded = 0
+        failed = []
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for start in range(0, len(jobs), checkpoint_every):
+                batch = jobs[start:start + checkpoint_every]
+                rows = []
+                for enrollment_number, encoding, error in pool.map(_reencode_worker, batch):
+                    if encoding is None:
+                        failed.append((enrollment_number, error))
+                    else:
+                        rows.append((enrollment_number, model_id, sqlite3.Binary(encoding),
+                                     datetime.now().isoformat(timespec="seconds")))
+                self.conn.executemany('''
+                INSERT OR REPLACE INTO face_encodings (enrollment_number, model_id, encoding, created_at)
+                VALUES (?, ?, ?, ?)
+                ''', rows)
+                self.conn.commit()
+                encoded += len(rows)
+                print(f"Re-encoded {min(start + len(batch), len(jobs))}/{len(jobs)} students for {model_id}")
+
+        without_samples = self.conn.execute('''
+        SELECT COUNT(*) FROM students s
+        WHERE NOT EXISTS (SELECT 1 FROM face_samples fs WHERE fs.enrollment_number = s.enrollment_number)
+        ''').fetchone()[0]
+        return encoded, failed, without_samples
+
+    def _switch_face_model(self, model_id):
+        # Caller owns the transaction. Students without an encoding for the new
+        # model are left with none and must be captured again.
+        self.conn.execute('''
+        UPDATE students SET face_encoding = (
+            SELECT encoding FROM face_encodings fe
+            WHERE fe.enrollment_number = students.enrollment_number AND fe.model_id = ?
+        )
+        ''', (model_id,))
+        self.set_meta("active_face_model", model_id)
+        return self.conn.execute('SELECT COUNT(*) FROM students WHERE face_encoding IS NULL').fetchone()[0]
+
+    def activate_face_model(self, model_id, force=False):
+        # Kiosks read students.face_encoding, so one write transaction checks
+        # coverage, swaps every student and the active model id together.
+        # With force, uncovered students are left without a face and returned
+        # so they can be recaptured.
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            missing = [row[0] for row in self.conn.execute('''
+            SELECT enrollment_number FROM students s WHERE NOT EXISTS (
+                SELECT 1 FROM face_encodings fe WHERE fe.enrollment_number = s.enrollment_number AND fe.model_id = ?
+            )
+            ORDER BY enrollment_number
+            ''', (model_id,))]
+            if missing and not force:
+                raise ValueError(f"{len(missing)} students have no {model_id} encoding yet; run the re-encode job "
+                                 f"again, or activate with --force and recapture them")
+
+            self._switch_face_model(model_id)
+            # Other nodes get the new encodings first, then the switch itself
+            cursor = self.conn.execute('''
+            SELECT enrollment_number, name, room, hostel_location, face_encoding FROM students
+            ''')
+            for enrollment_number, name, room, hostel_location, face_encoding in cursor.fetchall():
+                self.log_change("students", "upsert", enrollment_number, {
+                    "enrollment_number": enrollment_number,
+                    "name": name,
+                    "room": room,
+                    "hostel_location": hostel_location,
+                    "face_encoding": base64.b64encode(bytes(face_encoding)).decode("ascii") if face_encoding else None,
+                    "model_id": model_id
+                })
+            self.log_change("face_model", "activate", model_id, {"model_id": model_id})
+            self.conn.commit()
+        except (sqlite3.Error, ValueError):
+            self.conn.rollback()
+            raise
+        self.face_gallery.rebuild(self)
+        return missing
+
+    def _store_face(self, enrollment_number, face_encoding_bytes, face_crop):
+        # Caller commits
+        self.conn.execute('''
+        INSERT OR REPLACE INTO face_encodings (enrollment_number, model_id, encoding, created_at)
+        VALUES (?, ?, ?, ?)
+        ''', (enrollment_number, self.active_face_model(), sqlite3.Binary(face_encoding_bytes),
+              datetime.now().isoformat(timespec="seconds")))
+        if face_crop is not None:
+            self.add_face_sample(enrollment_number, face_crop)
+
+    def recapture_face(self, enrollment_number, face_encoding, face_crop=None):
+        # Replaces an existing student's face for the active model, e.g. after
+        # a forced model switch or for students registered before crops were kept
         try:
+            row = self.conn.execute('''
+            SELECT name, room, hostel_location, active FROM students WHERE enrollment_number = ?
+            ''', (enrollment_number,)).fetchone()
+            if not row:
+                return f"Student with enrollment number {enrollment_number} not found."
+            duplicate = self.find_duplicate_face(face_encoding, exclude=enrollment_number)
+            if duplicate:
+                return f"This face is already registered under enrollment number {duplicate[0]}."
+
+            name, room, hostel_location, active = row
+            face_encoding_bytes = pickle.dumps(face_encoding)
+            self.conn.execute('UPDATE students SET face_encoding = ? WHERE enrollment_number = ?',
+                              (sqlite3.Binary(face_encoding_bytes), enrollment_number))
+            self._store_face(enrollment_number, face_encoding_bytes, face_crop)
+            self.log_change("students", "upsert", enrollment_number, {
+                "enrollment_number": enrollment_number,
+                "name": name,
+                "room": room,
+                "hostel_location": hostel_location,
+                "face_encoding": base64.b64encode(face_encoding_bytes).decode("ascii"),
+                "model_id": self.active_face_model()
+            })
+            self.conn.commit()
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            return f"Face update failed: {str(e)}"
+        if active:
+            try:
+                self.face_gallery.add(hostel_location, enrollment_number, face_encoding, self)
+            except (OSError, ValueError) as e:
+                print(f"Failed to update face gallery: {e}")
+        return f"Face updated for {name} ({enrollment_number})."
+
+    def register_student(self, enrollment_number, name, room, hostel_location, face_encoding, face_crop=None):
+        try:
+            duplicate = self.find_duplicate_face(face_encoding, exclude=enrollment_number)
+            if duplicate:
+                return f"This face is already registered under enrollment number {duplicate[0]}."
+
             face_encoding_bytes = pickle.dumps(face_encoding)
             
             self.conn.execute('''
             INSERT INTO students (enrollment_number, name, room, hostel_location, face_encoding) 
             VALUES (?, ?, ?, ?, ?)
             ''', (enrollment_number, name, room, hostel_location, sqlite3.Binary(face_encoding_bytes)))
+            self._store_face(enrollment_number, face_encoding_bytes, face_crop)
+            self.log_change("students", "upsert", enrollment_number, {
+                "enrollment_number": enrollment_number,
+                "name": name,
+                "room": room,
+                "hostel_location": hostel_location,
+                "face_encoding": base64.b64encode(face_encoding_bytes).decode("ascii"),
+                "model_id": self.active_face_model()
+            })
             self.conn.commit()
+            if self.attendance_matrix is not None:
+                self.attendance_matrix.add_student(enrollment_number, hostel_location)
+            try:
+                self.face_gallery.add(hostel_location, enrollment_number, face_encoding, self)
+            except (OSError, ValueError) as e:
+                print(f"Failed to update face gallery: {e}")
             return f"Student {name} registered successfully in room {room}."
         except sqlite3.IntegrityError:
             return "Enrollment Number already exists."
         except Exception as e:
             return f"Registration failed: {str(e)}"
 
-    def mark_attendance(self, enrollment_number):
-        date = datetime.now().strftime("%Y-%m-%d")
+    def insert_attendance(self, enrollment_number, date, ts=None):
         self.conn.execute('''
-        INSERT INTO attendance (enrollment_number, date) VALUES (?, ?)
-        ''', (enrollment_number, date))
+        INSERT INTO attendance (enrollment_number, date, day, ts) VALUES (?, ?, ?, ?)
+        ''', (enrollment_number, date, to_day_number(date), ts))
+
+    def mark_attendance(self, enrollment_number):
+        now = datetime.now()
+        date = now.strftime("%Y-%m-%d")
+        ts = int(now.timestamp())
+        self.insert_attendance(enrollment_number, date, ts)
+        self.log_attendance(enrollment_number, date, ts)
         self.conn.commit()
+        self.refresh_attendance_matrix()
         return f"Attendance marked for enrollment number {enrollment_number} on {date}."
 
-    def view_attendance(self, enrollment_number):
+    def get_student_face_data(self, enrollment_number):
+        # Also returns the active face model so verification needs one round trip
         cursor = self.conn.execute('''
-        SELECT date FROM attendance WHERE enrollment_number = ?
+        SELECT hostel_location, face_encoding, active 
+        FROM students 
+        WHERE enrollment_number = ?
         ''', (enrollment_number,))
-        records = cursor.fetchall()
+        row = cursor.fetchone()
+        return row + (self.active_face_model(),) if row else None
+
+    def mark_attendance_once(self, enrollment_number):
+        now = datetime.now()
+        date = now.strftime("%Y-%m-%d")
+        ts = int(now.timestamp())
+        try:
+            cursor = self.conn.execute('''
+            SELECT COUNT(*) FROM attendance 
+            WHERE enrollment_number = ? AND day = ?
+            ''', (enrollment_number, to_day_number(date)))
+            if cursor.fetchone()[0] > 0:
+                return False
+
+            self.insert_attendance(enrollment_number, date, ts)
+            self.log_attendance(enrollment_number, date, ts)
+            self.conn.commit()
+            self.refresh_attendance_matrix()
+            return True
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+
+    def view_attendance(self, enrollment_number):
+        records = self.query_attendance(enrollment_number=enrollment_number)
         if records:
-            return f"Attendance records for enrollment number {enrollment_number}:\n" + "\n".join([record[0] for record in records])
+            return f"Attendance records for enrollment number {enrollment_number}:\n" + "\n".join([record[1] for record in records])
         else:
             return "No attendance records found."
 
+    def _attendance_filter(self, enrollment_number, start_day, end_day, by_day=True):
+        # Partitions archived before the day column existed are filtered on date instead
+        column = "day" if by_day else "date"
+        convert = (lambda day: day) if by_day else day_number_to_date
+        clauses = []
+        params = []
+        if enrollment_number is not None:
+            clauses.append("enrollment_number = ?")
+            params.append(enrollment_number)
+        if start_day is not None:
+            clauses.append(f"{column} >= ?")
+            params.append(convert(start_day))
+        if end_day is not None:
+            clauses.append(f"{column} <= ?")
+            params.append(convert(end_day))
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        return where, params
+
+    def _overlapping_partitions(self, start_date, end_date):
+        # Partition ranges are [start_date, end_date), query ranges are inclusive
+        cursor = self.conn.execute('''
+        SELECT name, path FROM attendance_partitions
+        WHERE (? IS NULL OR end_date > ?) AND (? IS NULL OR start_date <= ?)
+        ORDER BY start_date
+        ''', (start_date, start_date, end_date, end_date))
+        return cursor.fetchall()
+
+    def _attendance_sources(self, start_day, end_day):
+        # Yields (schema, filters on day) for each overlapping partition, then main;
+        # a partition stays attached only while its caller's query runs.
+        start_date = day_number_to_date(start_day) if start_day is not None else None
+        end_date = day_number_to_date(end_day) if end_day is not None else None
+        for name, path in self._overlapping_partitions(start_date, end_date):
+            if not os.path.exists(path):
+                print(f"Missing attendance partition {name}: {path}")
+                continue
+            self.conn.execute('ATTACH DATABASE ? AS part', (path,))
+            try:
+                yield "part", self.has_column("attendance", "day", "part")
+            finally:
+                self.conn.execute('DETACH DATABASE part')
+        yield "main", True
+
+    def query_attendance(self, enrollment_number=None, start_date=None, end_date=None):
+        start_day = to_day_number(start_date) if start_date is not None else None
+        end_day = to_day_number(end_date) if end_date is not None else None
+        return self.attendance_between(start_day, end_day, enrollment_number)
+
+    def attendance_between(self, start_day=None, end_day=None, enrollment_number=None):
+        # Inclusive day numbers; returns (enrollment_number, date) ordered by date
+        records = []
+        for schema, by_day in self._attendance_sources(start_day, end_day):
+            where, params = self._attendance_filter(enrollment_number, start_day, end_day, by_day)
+            cursor = self.conn.execute(f'SELECT enrollment_number, date FROM {schema}.attendance{where}', params)
+            records.extend(cursor.fetchall())
+        records.sort(key=lambda record: (record[1], record[0]))
+        return records
+
+    def attendance_on(self, value, enrollment_number=None):
+        day = to_day_number(value)
+        return self.attendance_between(day, day, enrollment_number)
+
+    def attendance_for_week(self, value, enrollment_number=None):
+        return self.attendance_between(*week_bounds(value), enrollment_number)
+
+    def attendance_for_month(self, value, enrollment_number=None):
+        return self.attendance_between(*month_bounds(value), enrollment_number)
+
+    def attendance_report(self, start_date=None, end_date=None):
+        start_day = to_day_number(start_date) if start_date is not None else None
+        end_day = to_day_number(end_date) if end_date is not None else None
+        counts = {}
+        for schema, by_day in self._attendance_sources(start_day, end_day):
+            where, params = self._attendance_filter(None, start_day, end_day, by_day)
+            cursor = self.conn.execute(f'''
+            SELECT enrollment_number, COUNT(*) FROM {schema}.attendance{where} GROUP BY enrollment_number
+            ''', params)
+            for enrollment_number, count in cursor.fetchall():
+                counts[enrollment_number] = counts.get(enrollment_number, 0) + count
+        return sorted(counts.items())
+
+    def _archive_month(self, name, path, start_date, end_date):
+        # Moves main rows in [start_date, end_date) into the partition file at path
+        start_day, end_day = to_day_number(start_date), to_day_number(end_date)
+
+        self.conn.execute('ATTACH DATABASE ? AS part', (path,))
+        try:
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS part.attendance (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                enrollment_number TEXT NOT NULL,
+                date TEXT NOT NULL
+            )''')
+            # Partition files written before day/ts existed are brought up to date
+            self.add_column_if_missing("attendance", "day", "INTEGER", "part")
+            self.add_column_if_missing("attendance", "ts", "INTEGER", "part")
+            self.conn.execute('''
+            UPDATE part.attendance SET day = CAST(julianday(date) - 2440587.5 AS INTEGER) WHERE day IS NULL
+            ''')
+            self.conn.execute('DROP INDEX IF EXISTS part.idx_attendance_enrollment_date')
+            self.conn.execute('''CREATE INDEX IF NOT EXISTS part.idx_attendance_enrollment_day
+                ON attendance (enrollment_number, day)''')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS part.idx_attendance_day ON attendance (day)')
+            cursor = self.conn.execute('''
+            INSERT INTO part.attendance (enrollment_number, date, day, ts)
+            SELECT a.enrollment_number, a.date, a.day, a.ts FROM main.attendance a
+            WHERE a.day >= ? AND a.day < ? AND NOT EXISTS (
+                SELECT 1 FROM part.attendance p
+                WHERE p.enrollment_number = a.enrollment_number AND p.day = a.day
+            )
+            ''', (start_day, end_day))
+            moved = cursor.rowcount
+            self.conn.execute('DELETE FROM main.attendance WHERE day >= ? AND day < ?', (start_day, end_day))
+            row_count = self.conn.execute('SELECT COUNT(*) FROM part.attendance').fetchone()[0]
+            self.conn.execute('''
+            INSERT INTO attendance_partitions (name, path, start_date, end_date, row_count, archived_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET
+                path = excluded.path,
+                row_count = excluded.row_count,
+                archived_at = excluded.archived_at
+            ''', (name, path, start_date, end_date, row_count, datetime.now().isoformat(timespec="seconds")))
+            self.conn.commit()
+        except sqlite3.Error as e:
+            print(f"Archive error for {name}: {e}")
+            self.conn.rollback()
+            raise
+        finally:
+            self.conn.execute('DETACH DATABASE part')
+        return moved
+
+    def _fold_late_attendance(self):
+        # Rows synced in for months that were already archived belong in their
+        # partition; leaving them in main would count them twice.
+        moved = 0
+        partitions = self.conn.execute('SELECT name, path, start_date, end_date FROM attendance_partitions').fetchall()
+        for name, path, start_date, end_date in partitions:
+            late = self.conn.execute('SELECT 1 FROM attendance WHERE day >= ? AND day < ? LIMIT 1',
+                                     (to_day_number(start_date), to_day_number(end_date))).fetchone()
+            if late and os.path.exists(path):
+                moved += self._archive_month(name, path, start_date, end_date)
+        return moved
+
+    def archive_attendance(self, before=None, archive_dir=os.path.join('database', 'archive')):
+        # Only whole months strictly before the month of `before` are closed
+        before = before or datetime.now().strftime("%Y-%m-%d")
+        cutoff = before[:7] + "-01"
+        os.makedirs(archive_dir, exist_ok=True)
+
+        cursor = self.conn.execute('''
+        SELECT DISTINCT substr(date, 1, 7) FROM attendance WHERE day < ? ORDER BY 1
+        ''', (to_day_number(cutoff),))
+        months = [row[0] for row in cursor.fetchall()]
+        self.conn.commit()
+        if months:
+            self._catch_up_attendance_snapshot()
+
+        moved = 0
+        for month in months:
+            year, mon = int(month[:4]), int(month[5:7])
+            start_date = f"{month}-01"
+            end_date = f"{year + mon // 12:04d}-{mon % 12 + 1:02d}-01"
+            name = f"attendance_{year:04d}_{mon:02d}"
+            moved += self._archive_month(name, os.path.join(archive_dir, name + ".db"), start_date, end_date)
+
+        if months:
+            self.conn.execute('VACUUM')
+        return months, moved
+
     def view_all_students(self):
         try:
             cursor = self.conn.execute('''
@@ -207,7 +1635,7 @@ class AttendanceTracker:
             students = cursor.fetchall()
             return students
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to fetch student details: {str(e)}")
+            print(f"Failed to fetch student details: {e}")
             return None
 
     def delete_student(self, enrollment_number):
@@ -215,16 +1643,438 @@ class AttendanceTracker:
             return False
             
         try:
-            self.conn.execute('DELETE FROM users WHERE enrollment_number = ?', (enrollment_number,))
-            self.conn.execute('DELETE FROM students WHERE enrollment_number = ?', (enrollment_number,))
-            self.conn.commit()
+            self.delete_cohort(enrollment_numbers=[enrollment_number])
             return True
         except Exception as e:
-            if self.conn:
-                self.conn.rollback()
-            messagebox.showerror("Error", f"Failed to delete student: {str(e)}")
+            print(f"Failed to delete student: {e}")
             return False
 
+    def _fill_cohort(self, prefix=None, enrollment_numbers=None, hostel=None):
+        if sum(selector is not None for selector in (prefix, enrollment_numbers, hostel)) != 1:
+            raise ValueError("Select a cohort by exactly one of prefix, enrollment list or hostel")
+
+        self.conn.execute('CREATE TEMP TABLE IF NOT EXISTS cohort (enrollment_number TEXT PRIMARY KEY)')
+        self.conn.execute('DELETE FROM temp.cohort')
+        if prefix is not None:
+            if not prefix:
+                raise ValueError("Enrollment prefix must not be empty")
+            # Range scan on the UNIQUE index instead of LIKE, which SQLite won't index here
+            upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+            self.conn.execute('''
+            INSERT INTO temp.cohort
+            SELECT enrollment_number FROM students WHERE enrollment_number >= ? AND enrollment_number < ?
+            UNION
+            SELECT enrollment_number FROM archived_students WHERE enrollment_number >= ? AND enrollment_number < ?
+            ''', (prefix, upper, prefix, upper))
+        elif hostel is not None:
+            self.conn.execute('''
+            INSERT INTO temp.cohort
+            SELECT enrollment_number FROM students WHERE hostel_location = ?
+            UNION
+            SELECT enrollment_number FROM archived_students WHERE hostel_location = ?
+            ''', (hostel, hostel))
+        else:
+            self.conn.executemany('INSERT OR IGNORE INTO temp.cohort VALUES (?)',
+                                  [(str(number),) for number in enrollment_numbers if number])
+        return self.conn.execute('SELECT COUNT(*) FROM temp.cohort').fetchone()[0]
+
+    def _log_cohort_change(self, op):
+        cursor = self.conn.execute('SELECT COALESCE(MAX(node_seq), 0) FROM changelog WHERE node_id = ?',
+                                   (self.node_id,))
+        base_seq = cursor.fetchone()[0]
+        self.conn.execute('''
+        INSERT INTO changelog (node_id, node_seq, table_name, op, row_key, payload, created_at)
+        SELECT ?, ? + ROW_NUMBER() OVER (ORDER BY enrollment_number), 'students', ?, enrollment_number,
+               json_object('enrollment_number', enrollment_number), ?
+        FROM temp.cohort
+        ''', (self.node_id, base_seq, op, datetime.now().isoformat(timespec="seconds")))
+
+    def _deactivate_cohort(self):
+        cursor = self.conn.execute('''
+        UPDATE students SET active = 0
+        WHERE active = 1 AND enrollment_number IN (SELECT enrollment_number FROM temp.cohort)
+        ''')
+        return {"students": cursor.rowcount}
+
+    def _archive_cohort(self):
+        self.conn.execute('''
+        INSERT OR REPLACE INTO archived_students (enrollment_number, name, room, hostel_location, face_encoding, archived_at)
+        SELECT enrollment_number, name, room, hostel_location, face_encoding, ?
+        FROM students WHERE enrollment_number IN (SELECT enrollment_number FROM temp.cohort)
+        ''', (datetime.now().isoformat(timespec="seconds"),))
+        self._delete_face_data()
+        users = self.conn.execute('''
+        DELETE FROM users WHERE enrollment_number IN (SELECT enrollment_number FROM temp.cohort)
+        ''').rowcount
+        students = self.conn.execute('''
+        DELETE FROM students WHERE enrollment_number IN (SELECT enrollment_number FROM temp.cohort)
+        ''').rowcount
+        return {"students": students, "users": users}
+
+    def _delete_face_data(self):
+        for table in ("face_samples", "face_encodings"):
+            self.conn.execute(f'''
+            DELETE FROM {table} WHERE enrollment_number IN (SELECT enrollment_number FROM temp.cohort)
+            ''')
+
+    def _delete_cohort(self):
+        self._delete_face_data()
+        attendance = self.conn.execute('''
+        DELETE FROM attendance WHERE enrollment_number IN (SELECT enrollment_number FROM temp.cohort)
+        ''').rowcount
+        users = self.conn.execute('''
+        DELETE FROM users WHERE enrollment_number IN (SELECT enrollment_number FROM temp.cohort)
+        ''').rowcount
+        students = self.conn.execute('''
+        DELETE FROM students WHERE enrollment_number IN (SELECT enrollment_number FROM temp.cohort)
+        ''').rowcount
+        archived = self.conn.execute('''
+        DELETE FROM archived_students WHERE enrollment_number IN (SELECT enrollment_number FROM temp.cohort)
+        ''').rowcount
+        return {"students": students, "archived": archived, "users": users, "attendance": attendance}
+
+    def _purge_archived_attendance(self):
+        # ATTACH is not allowed inside a transaction, so archives are cleaned
+        # one file at a time after the main delete has committed.
+        removed = 0
+        for name, path in self._overlapping_partitions(None, None):
+            if not os.path.exists(path):
+                continue
+            self.conn.execute('ATTACH DATABASE ? AS part', (path,))
+            try:
+                removed += self.conn.execute('''
+                DELETE FROM part.attendance WHERE enrollment_number IN (SELECT enrollment_number FROM temp.cohort)
+                ''').rowcount
+                self.conn.execute('''
+                UPDATE attendance_partitions SET row_count = (SELECT COUNT(*) FROM part.attendance) WHERE name = ?
+                ''', (name,))
+                self.conn.commit()
+            except sqlite3.Error as e:
+                print(f"Archive purge error for {name}: {e}")
+                self.conn.rollback()
+                raise
+            finally:
+                self.conn.execute('DETACH DATABASE part')
+        return removed
+
+    def _run_cohort_operation(self, op, operation, **selector):
+        try:
+            self._fill_cohort(**selector)
+            counts = operation()
+            self._log_cohort_change(op)
+            self.conn.commit()
+            cohort = [row[0] for row in self.conn.execute('SELECT enrollment_number FROM temp.cohort')]
+            if self.attendance_matrix is not None:
+                self.attendance_matrix.remove_students(cohort)
+            self.face_gallery.remove(cohort)
+            return counts
+        except sqlite3.Error as e:
+            print(f"Cohort {op} error: {e}")
+            self.conn.rollback()
+            raise
+
+    def deactivate_cohort(self, prefix=None, enrollment_numbers=None, hostel=None):
+        return self._run_cohort_operation("deactivate", self._deactivate_cohort,
+                                          prefix=prefix, enrollment_numbers=enrollment_numbers, hostel=hostel)
+
+    def archive_cohort(self, prefix=None, enrollment_numbers=None, hostel=None):
+        return self._run_cohort_operation("archive", self._archive_cohort,
+                                          prefix=prefix, enrollment_numbers=enrollment_numbers, hostel=hostel)
+
+    def delete_cohort(self, prefix=None, enrollment_numbers=None, hostel=None):
+        counts = self._run_cohort_operation("delete", self._delete_cohort,
+                                            prefix=prefix, enrollment_numbers=enrollment_numbers, hostel=hostel)
+        counts["attendance"] += self._purge_archived_attendance()
+        return counts
+
+    def get_meta(self, key, default=None):
+        cursor = self.conn.execute('SELECT value FROM sync_meta WHERE key = ?', (key,))
+        row = cursor.fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        self.conn.execute('''
+        INSERT INTO sync_meta (key, value) VALUES (?, ?)
+        ON CONFLICT(key) DO UPDATE SET value = excluded.value
+        ''', (key, str(value)))
+
+    def get_node_id(self):
+        node_id = self.get_meta("node_id")
+        if node_id is None:
+            node_id = uuid.uuid4().hex
+            self.set_meta("node_id", node_id)
+            self.conn.commit()
+        return node_id
+
+    def log_change(self, table_name, op, row_key, payload=None):
+        # Caller owns the transaction so the change and its log entry commit together
+        node_id = self.node_id
+        cursor = self.conn.execute('SELECT COALESCE(MAX(node_seq), 0) + 1 FROM changelog WHERE node_id = ?',
+                                   (node_id,))
+        node_seq = cursor.fetchone()[0]
+        self.conn.execute('''
+        INSERT INTO changelog (node_id, node_seq, table_name, op, row_key, payload, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (node_id, node_seq, table_name, op, str(row_key),
+              json.dumps(payload) if payload is not None else None,
+              datetime.now().isoformat(timespec="seconds")))
+
+    def log_attendance(self, enrollment_number, date, ts=None):
+        self.log_change("attendance", "insert", f"{enrollment_number}/{date}", {
+            "enrollment_number": enrollment_number,
+            "date": date,
+            "ts": ts
+        })
+
+    def apply_change(self, table_name, op, payload):
+        if table_name == "users" and op == "upsert":
+            self.conn.execute('''
+            INSERT INTO users (username, password, role, enrollment_number) VALUES (?, ?, ?, ?)
+            ON CONFLICT(username) DO UPDATE SET
+                password = excluded.password,
+                role = excluded.role,
+                enrollment_number = excluded.enrollment_number
+            ''', (payload["username"], payload["password"], payload["role"], payload["enrollment_number"]))
+        elif table_name == "students" and op == "upsert":
+            face_encoding = base64.b64decode(payload["face_encoding"]) if payload.get("face_encoding") else None
+            # Bundles from nodes that predate model ids are assumed to use ours
+            active_model = self.active_face_model()
+            model_id = payload.get("model_id") or active_model
+            if face_encoding is not None:
+                self.conn.execute('''
+                INSERT OR REPLACE INTO face_encodings (enrollment_number, model_id, encoding, created_at)
+                VALUES (?, ?, ?, ?)
+                ''', (payload["enrollment_number"], model_id, sqlite3.Binary(face_encoding),
+                      datetime.now().isoformat(timespec="seconds")))
+            if model_id != active_model:
+                # An encoding from another model would never match at our kiosks;
+                # it is kept in face_encodings for when this node switches too.
+                usable = self.conn.execute('''
+                SELECT 1 FROM face_encodings WHERE enrollment_number = ? AND model_id = ?
+                ''', (payload["enrollment_number"], active_model)).fetchone()
+                if not usable:
+                    print(f"Student {payload['enrollment_number']} was encoded with {model_id} but this node "
+                          f"uses {active_model}; capture their face again to verify them here.")
+                face_encoding = None
+            self.conn.execute('''
+            INSERT INTO students (enrollment_number, name, room, hostel_location, face_encoding)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(enrollment_number) DO UPDATE SET
+                name = excluded.name,
+                room = excluded.room,
+                hostel_location = excluded.hostel_location,
+                face_encoding = CASE WHEN ? THEN excluded.face_encoding ELSE students.face_encoding END
+            ''', (payload["enrollment_number"], payload["name"], payload["room"], payload["hostel_location"],
+                  sqlite3.Binary(face_encoding) if face_encoding is not None else None,
+                  model_id == active_model))
+        elif table_name == "face_model" and op == "activate":
+            uncovered = self._switch_face_model(payload["model_id"])
+            if uncovered:
+                print(f"Switched to {payload['model_id']}; {uncovered} students have no encoding for it "
+                      f"and must be captured again.")
+        elif table_name == "students" and op in ("deactivate", "archive", "delete"):
+            self._fill_cohort(enrollment_numbers=[payload["enrollment_number"]])
+            operations = {
+                "deactivate": self._deactivate_cohort,
+                "archive": self._archive_cohort,
+                "delete": self._delete_cohort
+            }
+            operations[op]()
+        elif table_name == "attendance" and op == "insert":
+            # Bundles from nodes that predate the ts field simply leave it empty
+            day = to_day_number(payload["date"])
+            self.conn.execute('''
+            INSERT INTO attendance (enrollment_number, date, day, ts)
+            SELECT ?, ?, ?, ? WHERE NOT EXISTS (
+                SELECT 1 FROM attendance WHERE enrollment_number = ? AND day = ?
+            )
+            ''', (payload["enrollment_number"], payload["date"], day, payload.get("ts"),
+                  payload["enrollment_number"], day))
+        else:
+            raise ValueError(f"Unknown change {table_name}/{op}")
+
+    def export_changes(self, directory, relay=False):
+        # Writes this node's own changelog rows that have not been exported yet.
+        # Only a central relay node also re-publishes rows imported from others.
+        os.makedirs(directory, exist_ok=True)
+        node_id = self.node_id
+        last_seq = int(self.get_meta("last_exported_seq", 0))
+        cursor = self.conn.execute('''
+        SELECT seq, node_id, node_seq, table_name, op, row_key, payload, created_at
+        FROM changelog WHERE seq > ? AND (? OR node_id = ?) ORDER BY seq
+        ''', (last_seq, relay, node_id))
+        rows = cursor.fetchall()
+        if not rows:
+            return None
+
+        to_seq = rows[-1][0]
+        bundle = {
+            "format": 1,
+            "node_id": node_id,
+            "from_seq": last_seq,
+            "to_seq": to_seq,
+            "changes": [
+                {
+                    "node_id": row[1],
+                    "node_seq": row[2],
+                    "table_name": row[3],
+                    "op": row[4],
+                    "row_key": row[5],
+                    "payload": row[6],
+                    "created_at": row[7]
+                } for row in rows
+            ]
+        }
+
+        path = os.path.join(directory, f"{node_id}-{to_seq:012d}.json.gz")
+        tmp_path = path + ".tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(bundle, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+        self.set_meta("last_exported_seq", to_seq)
+        self.conn.commit()
+        return path
+
+    def import_changes(self, directory):
+        node_id = self.node_id
+        applied = 0
+        skipped = 0
+        deleted = []
+        for path in sorted(glob.glob(os.path.join(directory, "*.json.gz"))):
+            name = os.path.basename(path)
+            if name.startswith(node_id + "-"):
+                continue
+            cursor = self.conn.execute('SELECT 1 FROM sync_bundles WHERE name = ?', (name,))
+            if cursor.fetchone():
+                continue
+
+            try:
+                with gzip.open(path, "rt", encoding="utf-8") as f:
+                    bundle = json.load(f)
+
+                bundle_deleted = []
+                for change in bundle["changes"]:
+                    cursor = self.conn.execute('''
+                    INSERT OR IGNORE INTO changelog (node_id, node_seq, table_name, op, row_key, payload, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ''', (change["node_id"], change["node_seq"], change["table_name"], change["op"],
+                          change["row_key"], change["payload"], change["created_at"]))
+                    # Already seen (our own change relayed back, or a bundle read twice)
+                    if cursor.rowcount == 0:
+                        skipped += 1
+                        continue
+                    payload = json.loads(change["payload"])
+                    self.apply_change(change["table_name"], change["op"], payload)
+                    if change["table_name"] == "students" and change["op"] == "delete":
+                        bundle_deleted.append(payload["enrollment_number"])
+                    applied += 1
+
+                self.conn.execute('INSERT INTO sync_bundles (name, imported_at) VALUES (?, ?)',
+                                  (name, datetime.now().isoformat(timespec="seconds")))
+                self.conn.commit()
+                deleted.extend(bundle_deleted)
+            except (sqlite3.Error, OSError, ValueError, KeyError) as e:
+                print(f"Sync error in {name}: {e}")
+                self.conn.rollback()
+
+        if applied:
+            self._catch_up_attendance_snapshot()
+            try:
+                self._fold_late_attendance()
+            except sqlite3.Error as e:
+                print(f"Sync error moving late attendance into archives: {e}")
+        if deleted:
+            # Same archive cascade delete_cohort runs; ATTACH has to wait for the commit
+            try:
+                self._fill_cohort(enrollment_numbers=deleted)
+                self.conn.commit()
+                self._purge_archived_attendance()
+            except sqlite3.Error as e:
+                print(f"Sync error purging deleted students from archives: {e}")
+                self.conn.rollback()
+        return applied, skipped
+
+    def sync_with(self, directory, relay=False):
+        applied, skipped = self.import_changes(directory)
+        self.refresh_attendance_matrix()
+        if applied:
+            self.face_gallery.rebuild(self)
+        exported = self.export_changes(directory, relay)
+        return applied, skipped, exported
+
+    def roll_call_changes(self, date, last_attendance_id, last_change_seq):
+        # Attendance is read by rowid and students through the changelog, so a
+        # poll costs only the new rows. Every student change (registration,
+        # sync upsert, deactivate/archive/delete) is logged with the enrollment
+        # number as row_key, so re-reading those students gives their new state.
+        if last_change_seq is None:
+            students = self.conn.execute('''
+            SELECT enrollment_number, name, room, hostel_location FROM students WHERE active = 1
+            ''').fetchall()
+            removed = []
+            last_change_seq = self.conn.execute('SELECT COALESCE(MAX(seq), 0) FROM changelog').fetchone()[0]
+        else:
+            changes = self.conn.execute('''
+            SELECT seq, row_key FROM changelog WHERE seq > ? AND table_name = 'students' ORDER BY seq
+            ''', (last_change_seq,)).fetchall()
+            changed = {row[1] for row in changes}
+            students = []
+            if changed:
+                students = self.conn.execute('''
+                SELECT enrollment_number, name, room, hostel_location FROM students
+                WHERE active = 1 AND enrollment_number IN (SELECT value FROM json_each(?))
+                ''', (json.dumps(sorted(changed)),)).fetchall()
+                last_change_seq = changes[-1][0]
+            removed = sorted(changed - {row[0] for row in students})
+
+        if last_attendance_id is None:
+            # First poll: tonight's rows plus the current high-water mark
+            present = [row[0] for row in self.conn.execute(
+                'SELECT enrollment_number FROM attendance WHERE day = ?', (to_day_number(date),))]
+            last_attendance_id = self.conn.execute('SELECT COALESCE(MAX(id), 0) FROM attendance').fetchone()[0]
+        else:
+            attendance = self.conn.execute('''
+            SELECT id, enrollment_number, date FROM attendance WHERE id > ? ORDER BY id
+            ''', (last_attendance_id,)).fetchall()
+            present = [row[1] for row in attendance if row[2] == date]
+            if attendance:
+                last_attendance_id = attendance[-1][0]
+        return students, removed, present, last_attendance_id, last_change_seq
+
+    def load_attendance_matrix(self, snapshot_path=ATTENDANCE_MATRIX_SNAPSHOT, rebuild=False):
+        if not rebuild and os.path.exists(snapshot_path):
+            self.attendance_matrix = AttendanceMatrix.load(snapshot_path)
+            self.attendance_matrix.sync_students(self)
+            self.attendance_matrix.refresh(self)
+        else:
+            self.attendance_matrix = AttendanceMatrix.from_tracker(self)
+        self.attendance_matrix.save(snapshot_path)
+        return self.attendance_matrix
+
+    def _catch_up_attendance_snapshot(self, snapshot_path=ATTENDANCE_MATRIX_SNAPSHOT):
+        # The snapshot only picks up rows from main by id, so it has to absorb
+        # them before archiving or a late sync moves them into a partition
+        if self.attendance_matrix is not None:
+            matrix = self.attendance_matrix
+        elif os.path.exists(snapshot_path):
+            matrix = AttendanceMatrix.load(snapshot_path)
+        else:
+            return
+        try:
+            matrix.sync_students(self)
+            matrix.refresh(self)
+            matrix.save(snapshot_path)
+        except (OSError, ValueError) as e:
+            # A stale snapshot would silently miss the moved rows
+            print(f"Could not update attendance snapshot, removing it: {e}")
+            if os.path.exists(snapshot_path):
+                os.remove(snapshot_path)
+
+    def refresh_attendance_matrix(self):
+        if self.attendance_matrix is not None:
+            self.attendance_matrix.refresh(self)
+
     def close_connection(self):
         self.conn.close()
 
@@ -239,10 +2089,155 @@ class AttendanceTracker:
             print(f"Error getting location: {e}")
             return None
 
+class DatabaseExecutor:
+    # Runs AttendanceTracker calls on one dedicated thread that owns the
+    # SQLite connection, and hands results back to Tk on the main thread.
+    def __init__(self, root, tracker_factory=None, poll_interval=20):
+        self.root = root
+        self.poll_interval = poll_interval
+        self.pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="attease-db")
+        self.results = queue.Queue()
+        self.cache = {}
+        self.pending = {}
+        self.after_id = None
+        self.tracker = self.pool.submit(tracker_factory or AttendanceTracker).result()
+        self._schedule_poll()
+
+    def _schedule_poll(self):
+        self.after_id = self.root.after(self.poll_interval, self._poll)
+
+    def _run(self, method, args, kwargs):
+        if callable(method):
+            return method(self.tracker, *args, **kwargs)
+        return getattr(self.tracker, method)(*args, **kwargs)
+
+    def submit(self, method, *args, callback=None, errback=None, owner=None, cache_key=None,
+               invalidates=(), **kwargs):
+        if cache_key is not None and cache_key in self.cache:
+            future = Future()
+            future.set_result(self.cache[cache_key])
+            self.results.put((future, callback, errback, owner, None, ()))
+            return future
+
+        future = self.pool.submit(self._run, method, args, kwargs)
+        if owner is not None:
+            self._track(owner, future)
+        future.add_done_callback(
+            lambda f: self.results.put((f, callback, errback, owner, cache_key, invalidates)))
+        return future
+
+    def call(self, method, *args, **kwargs):
+        # Blocking variant for code that is not driven by the Tk event loop
+        return self.pool.submit(self._run, method, args, kwargs).result()
+
+    def _track(self, owner, future):
+        key = str(owner)
+        if key not in self.pending:
+            self.pending[key] = set()
+            owner.bind("<Destroy>", lambda event: self._owner_destroyed(event, owner), add="+")
+        self.pending[key].add(future)
+
+    def _owner_destroyed(self, event, owner):
+        # <Destroy> also fires for every child of a Toplevel
+        if event.widget is not owner:
+            return
+        for future in self.pending.pop(str(owner), set()):
+            future.cancel()
+
+    def _is_alive(self, owner):
+        try:
+            return bool(owner.winfo_exists())
+        except tk.TclError:
+            return False
+
+    def invalidate(self, *keys):
+        for key in keys:
+            self.cache.pop(key, None)
+
+    def _poll(self):
+        # Only hands results over to Tk here; each callback runs as its own idle
+        # event, so one that raises or opens a modal dialog cannot stall the rest.
+        try:
+            while True:
+                try:
+                    result = self.results.get_nowait()
+                except queue.Empty:
+                    break
+                self.root.after_idle(self._deliver, *result)
+        finally:
+            self._schedule_poll()
+
+    def _deliver(self, future, callback, errback, owner, cache_key, invalidates):
+        if owner is not None:
+            self.pending.get(str(owner), set()).discard(future)
+        if future.cancelled():
+            return
+
+        error = future.exception()
+        if error is None:
+            if cache_key is not None:
+                self.cache[cache_key] = future.result()
+            self.invalidate(*invalidates)
+
+        if owner is not None and not self._is_alive(owner):
+            return
+        try:
+            if error is not None:
+                if errback:
+                    errback(error)
+                else:
+                    messagebox.showerror("Error", str(error))
+            elif callback:
+                callback(future.result())
+        except Exception as e:
+            print(f"Error handling database result: {e}")
+
+    def shutdown(self):
+        if self.after_id is not None:
+            try:
+                self.root.after_cancel(self.after_id)
+            except tk.TclError:
+                pass
+            self.after_id = None
+        self.pool.submit(self.tracker.close_connection).result()
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+class AppShell:
+    # One Tk root, one DB thread and one tracker for the whole process;
+    # screens are swapped inside the root instead of recreating it.
+    def __init__(self, root):
+        self.root = root
+        self.db = DatabaseExecutor(root)
+        self.screen = None
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+
+    def clear(self):
+        # Also closes any Toplevel dialogs the previous screen opened
+        for child in self.root.winfo_children():
+            child.destroy()
+
+    def show_login(self):
+        self.clear()
+        self.db.cache.clear()
+        self.screen = LoginWindow(self.root, self)
+
+    def show_dashboard(self, role, enrollment_number=None):
+        self.clear()
+        self.screen = AttendanceApp(self.root, self, role, enrollment_number)
+
+    def run(self):
+        self.show_login()
+        self.root.mainloop()
+
+    def close(self):
+        self.db.shutdown()
+        self.root.destroy()
+
 class LoginWindow:
-    def __init__(self, root, tracker):
+    def __init__(self, root, shell):
         self.root = root
-        self.tracker = tracker
+        self.shell = shell
+        self.db = shell.db
         self.root.title("Login - Attendance System")
         self.root.geometry("400x580")
         self.root.configure(bg=BG_COLOR)
@@ -343,21 +2338,20 @@ class LoginWindow:
             messagebox.showerror("Error", "Please enter both username and password")
             return
 
-        try:
-            result = self.tracker.authenticate_user(username, password)
+        def on_authenticated(result):
             if result:
                 user_role, enrollment_number = result
                 if user_role == role:
-                    self.root.destroy()
-                    root = tk.Tk()
-                    app = AttendanceApp(root, self.tracker, user_role, enrollment_number)
-                    root.mainloop()
+                    self.shell.show_dashboard(user_role, enrollment_number)
                 else:
                     messagebox.showerror("Error", "Invalid role selected")
             else:
                 messagebox.showerror("Error", "Invalid username or password")
-        except Exception as e:
-            messagebox.showerror("Error", f"Login failed: {str(e)}")
+
+        self.db.submit("authenticate_user", username, password,
+                       callback=on_authenticated,
+                       errback=lambda e: messagebox.showerror("Error", f"Login failed: {str(e)}"),
+                       owner=self.root)
 
     def show_signup(self):
         signup_window = tk.Toplevel(self.root)
@@ -408,14 +2402,17 @@ class LoginWindow:
                 messagebox.showerror("Error", "Enrollment Number is required for student accounts")
                 return
 
-            try:
-                if self.tracker.register_user(username, password, role, enrollment_number):
+            def on_registered(registered):
+                if registered:
                     messagebox.showinfo("Success", "Account created successfully")
                     signup_window.destroy()
                 else:
                     messagebox.showerror("Error", "Username already exists")
-            except Exception as e:
-                messagebox.showerror("Error", f"Signup failed: {str(e)}")
+
+            self.db.submit("register_user", username, password, role, enrollment_number,
+                           callback=on_registered,
+                           errback=lambda e: messagebox.showerror("Error", f"Signup failed: {str(e)}"),
+                           owner=signup_window)
 
         signup_button = tk.Button(main_frame,
                                 text="Sign Up",
@@ -427,9 +2424,195 @@ class LoginWindow:
                                 pady=10)
         signup_button.pack(pady=20)
 
+class RollCallWindow:
+    # Live view of tonight's roll call. Only attendance rows and student
+    # changelog entries newer than the last poll are fetched, and only the
+    # affected Treeview items are touched.
+    def __init__(self, root, db, poll_interval=3000):
+        self.db = db
+        self.poll_interval = poll_interval
+        self.date = datetime.now().strftime("%Y-%m-%d")
+        self.last_attendance_id = None
+        self.last_change_seq = None
+        self.students = {}
+        self.present = set()
+        self.totals = {}
+        self.present_counts = {}
+        self.after_id = None
+        self.loading = False
+
+        self.window = tk.Toplevel(root)
+        self.window.title("Live Roll Call")
+        self.window.geometry("800x600")
+        self.window.configure(bg="#f0f0f0")
+
+        main_frame = ttk.Frame(self.window, padding="20")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+
+        title_font = Font(family="Helvetica", size=16, weight="bold")
+        ttk.Label(main_frame,
+                  text="Live Roll Call",
+                  font=title_font,
+                  padding=10,
+                  foreground="#2E7D32").pack(pady=10)
+
+        self.summary_label = ttk.Label(main_frame, text="Loading...", font=("Helvetica", 10))
+        self.summary_label.pack(anchor=tk.W, pady=(0, 10))
+
+        table_frame = ttk.Frame(main_frame)
+        table_frame.pack(fill=tk.BOTH, expand=True)
+
+        tree_scroll = ttk.Scrollbar(table_frame)
+        tree_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.tree = ttk.Treeview(table_frame, columns=("name", "status"), yscrollcommand=tree_scroll.set)
+        self.tree.heading("#0", text="Hostel / Room / Enrollment")
+        self.tree.heading("name", text="Name")
+        self.tree.heading("status", text="Status")
+        self.tree.column("#0", width=300)
+        self.tree.column("name", width=200)
+        self.tree.column("status", width=120)
+        self.tree.tag_configure("present", foreground=ACCENT_COLOR)
+        self.tree.tag_configure("missing", foreground=ERROR_COLOR)
+        self.tree.pack(fill=tk.BOTH, expand=True)
+        tree_scroll.config(command=self.tree.yview)
+
+        close_button = tk.Button(main_frame,
+                               text="Close",
+                               command=self.window.destroy,
+                               bg="#2E7D32",
+                               fg="white",
+                               font=("Helvetica", 10, "bold"),
+                               padx=20,
+                               pady=10)
+        close_button.pack(pady=10)
+
+        self.window.bind("<Destroy>", self.on_destroy, add="+")
+        self.poll()
+
+    def on_destroy(self, event):
+        if event.widget is self.window and self.after_id is not None:
+            self.window.after_cancel(self.after_id)
+            self.after_id = None
+
+    def poll(self):
+        self.after_id = None
+        today = datetime.now().strftime("%Y-%m-%d")
+        if today != self.date:
+            self.reset_day(today)
+        if not self.loading:
+            self.loading = True
+            self.db.submit("roll_call_changes", self.date, self.last_attendance_id, self.last_change_seq,
+                           callback=self.apply_changes,
+                           errback=self.on_error,
+                           owner=self.window)
+        self.after_id = self.window.after(self.poll_interval, self.poll)
+
+    def on_error(self, error):
+        self.loading = False
+        self.summary_label.config(text=f"Refresh failed: {error}")
+
+    def reset_day(self, today):
+        self.date = today
+        for enrollment_number in self.present:
+            self.set_status(enrollment_number, False)
+        self.present.clear()
+
+    def room_node(self, hostel, room):
+        hostel_id = f"hostel:{hostel}"
+        room_id = f"room:{hostel}:{room}"
+        if not self.tree.exists(hostel_id):
+            self.tree.insert("", tk.END, iid=hostel_id, text=hostel or "Unknown hostel", open=True)
+            self.totals[hostel_id] = 0
+            self.present_counts[hostel_id] = 0
+        if not self.tree.exists(room_id):
+            self.tree.insert(hostel_id, tk.END, iid=room_id, text=f"Room {room}", open=False)
+            self.totals[room_id] = 0
+            self.present_counts[room_id] = 0
+        return hostel_id, room_id
+
+    def update_counts(self, *node_ids):
+        for node_id in node_ids:
+            if not self.tree.exists(node_id):
+                continue
+            label = f"{self.present_counts[node_id]} / {self.totals[node_id]} present"
+            self.tree.item(node_id, values=("", label))
+
+    def add_student(self, enrollment_number, name, room, hostel):
+        hostel_id, room_id = self.room_node(hostel or "", room or "")
+        self.students[enrollment_number] = (hostel_id, room_id)
+        self.tree.insert(room_id, tk.END, iid=f"student:{enrollment_number}", text=enrollment_number,
+                         values=(name, "Missing"), tags=("missing",))
+        self.totals[hostel_id] += 1
+        self.totals[room_id] += 1
+        return hostel_id, room_id
+
+    def remove_student(self, enrollment_number):
+        hostel_id, room_id = self.students.pop(enrollment_number)
+        self.tree.delete(f"student:{enrollment_number}")
+        delta = 1 if enrollment_number in self.present else 0
+        self.present.discard(enrollment_number)
+        for node_id in (room_id, hostel_id):
+            self.totals[node_id] -= 1
+            self.present_counts[node_id] -= delta
+            # Drop rooms and hostels nobody is left in
+            if self.totals[node_id] == 0:
+                self.tree.delete(node_id)
+                del self.totals[node_id]
+                del self.present_counts[node_id]
+        return hostel_id, room_id
+
+    def set_status(self, enrollment_number, present):
+        hostel_id, room_id = self.students[enrollment_number]
+        item_id = f"student:{enrollment_number}"
+        name = self.tree.item(item_id, "values")[0]
+        self.tree.item(item_id, values=(name, "Present" if present else "Missing"),
+                       tags=("present" if present else "missing",))
+        delta = 1 if present else -1
+        self.present_counts[hostel_id] += delta
+        self.present_counts[room_id] += delta
+        self.update_counts(hostel_id, room_id)
+
+    def apply_changes(self, changes):
+        self.loading = False
+        students, removed, present, last_attendance_id, last_change_seq = changes
+
+        touched = set()
+        for enrollment_number in removed:
+            if enrollment_number in self.students:
+                touched.update(self.remove_student(enrollment_number))
+        for enrollment_number, name, room, hostel in students:
+            item_id = f"student:{enrollment_number}"
+            if enrollment_number not in self.students:
+                touched.update(self.add_student(enrollment_number, name, room, hostel))
+            elif self.students[enrollment_number] == (f"hostel:{hostel or ''}", f"room:{hostel or ''}:{room or ''}"):
+                self.tree.item(item_id, values=(name, self.tree.item(item_id, "values")[1]))
+            else:
+                # Moved to another hostel or room: re-file, keeping tonight's status
+                was_present = enrollment_number in self.present
+                touched.update(self.remove_student(enrollment_number))
+                touched.update(self.add_student(enrollment_number, name, room, hostel))
+                if was_present:
+                    self.present.add(enrollment_number)
+                    self.set_status(enrollment_number, True)
+        self.update_counts(*touched)
+
+        for enrollment_number in present:
+            if enrollment_number in self.students and enrollment_number not in self.present:
+                self.present.add(enrollment_number)
+                self.set_status(enrollment_number, True)
+
+        self.last_attendance_id = last_attendance_id
+        self.last_change_seq = last_change_seq
+
+        total = len(self.students)
+        self.summary_label.config(
+            text=f"{self.date}: {len(self.present)} present, {total - len(self.present)} missing of {total} students")
+
 class AttendanceApp:
-    def __init__(self, root, tracker, role, enrollment_number=None):
-        self.tracker = tracker
+    def __init__(self, root, shell, role, enrollment_number=None):
+        self.shell = shell
+        self.db = shell.db
         self.role = role
         self.enrollment_number = enrollment_number
         self.root = root
@@ -496,6 +2679,29 @@ class AttendanceApp:
             view_btn.grid(row=row, column=1, padx=10, pady=10, sticky="ew")
             row += 1
 
+            cohort_btn = CustomButton(button_frame,
+                                    text="Manage Cohort",
+                                    command=self.manage_cohort,
+                                    bg=THEME_COLOR,
+                                    fg="white")
+            cohort_btn.grid(row=row, column=0, padx=10, pady=10, sticky="ew")
+
+            roll_call_btn = CustomButton(button_frame,
+                                       text="Live Roll Call",
+                                       command=self.open_roll_call,
+                                       bg=THEME_COLOR,
+                                       fg="white")
+            roll_call_btn.grid(row=row, column=1, padx=10, pady=10, sticky="ew")
+            row += 1
+
+            recapture_btn = CustomButton(button_frame,
+                                       text="Recapture Face",
+                                       command=self.recapture_face,
+                                       bg=THEME_COLOR,
+                                       fg="white")
+            recapture_btn.grid(row=row, column=0, columnspan=2, padx=10, pady=10, sticky="ew")
+            row += 1
+
         if role == "student":
             mark_btn = CustomButton(button_frame,
                                   text="Mark Today's Attendance",
@@ -523,17 +2729,8 @@ class AttendanceApp:
         self.status_bar.pack(side=tk.BOTTOM, fill=tk.X)
 
     def go_back_to_login(self):
-        # Close the database connection
-        self.tracker.close_connection()
-        
-        # Destroy current window
-        self.root.destroy()
-        
-        # Create new login window
-        root = tk.Tk()
-        tracker = AttendanceTracker()  # Create a new tracker instance
-        login_window = LoginWindow(root, tracker)
-        root.mainloop()
+        # Keep the root, DB thread and connection; just swap the screen
+        self.shell.show_login()
 
     def register_student(self):
         register_window = tk.Toplevel(self.root)
@@ -613,13 +2810,19 @@ class AttendanceApp:
                 messagebox.showerror("Error", "Please capture face before registering")
                 return
                 
-            message = self.tracker.register_student(enrollment_number, name, room, current_location, self.face_encoding)
-            if "successfully" in message:
-                messagebox.showinfo("Success", message)
-                register_window.destroy()
-                self.status_bar.config(text=f"Student {name} registered successfully")
-            else:
-                messagebox.showerror("Error", message)
+            def on_registered(message):
+                if "successfully" in message:
+                    messagebox.showinfo("Success", message)
+                    register_window.destroy()
+                    self.status_bar.config(text=f"Student {name} registered successfully")
+                else:
+                    messagebox.showerror("Error", message)
+
+            self.db.submit("register_student", enrollment_number, name, room, current_location, self.face_encoding,
+                           getattr(self, "face_crop", None),
+                           callback=on_registered,
+                           owner=register_window,
+                           invalidates=("students",))
         
         submit_button = tk.Button(button_frame,
                                 text="Register",
@@ -642,44 +2845,31 @@ class AttendanceApp:
         cancel_button.pack(side=tk.RIGHT, padx=10)
 
     def capture_face(self, status_label):
+        # The active model comes from the DB thread; the camera starts once it arrives
+        status_label.config(text="Starting camera...", foreground="black")
+        self.db.submit("active_face_model",
+                       callback=lambda model_id: self.capture_face_with(model_id, status_label),
+                       owner=status_label)
+
+    def capture_face_with(self, model_id, status_label):
         try:
-            cap = cv2.VideoCapture(0)
-            if not cap.isOpened():
+            backend = get_face_backend(model_id)
+            source = open_frame_source()
+            if not source.isOpened():
                 messagebox.showerror("Error", "Could not open camera")
                 return
             
-            cv2.namedWindow("Face Capture", cv2.WINDOW_NORMAL)
-            cv2.resizeWindow("Face Capture", 640, 480)
-            
-            face_detected = False
-            face_encoding = None
-            
-            while True:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                
-                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                
-                face_locations = face_recognition.face_locations(rgb_frame)
-                
-                if face_locations:
-                    top, right, bottom, left = face_locations[0]
-                    cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
-                    
-                    face_encoding = face_recognition.face_encodings(rgb_frame, face_locations)[0]
-                    face_detected = True
-                
-                cv2.imshow("Face Capture", frame)
-                
-                if cv2.waitKey(1) & 0xFF == ord('q'):
-                    break
-            
-            cap.release()
-            cv2.destroyAllWindows()
+            sink = open_display_sink("Face Capture", timeout=HEADLESS_DIALOG_TIMEOUT)
+            try:
+                face_encoding, face_crop = capture_face_encoding(source, sink, backend,
+                                                                 stop_when_found=not sink.interactive)
+            finally:
+                source.release()
+                sink.close()
             
-            if face_detected and face_encoding is not None:
+            if face_encoding is not None:
                 self.face_encoding = face_encoding
+                self.face_crop = face_crop
                 status_label.config(text="Face captured successfully", foreground="green")
             else:
                 messagebox.showerror("Error", "No face detected. Please try again.")
@@ -689,6 +2879,47 @@ class AttendanceApp:
             messagebox.showerror("Error", f"Failed to capture face: {str(e)}")
             status_label.config(text="Face not captured", foreground="red")
 
+    def recapture_face(self):
+        enrollment_number = simpledialog.askstring("Recapture Face", "Enter Enrollment Number:")
+        if not enrollment_number:
+            return
+        self.status_bar.config(text="Starting camera...")
+        self.db.submit("active_face_model",
+                       callback=lambda model_id: self.recapture_face_with(enrollment_number, model_id),
+                       owner=self.root)
+
+    def recapture_face_with(self, enrollment_number, model_id):
+        try:
+            source = open_frame_source()
+            if not source.isOpened():
+                messagebox.showerror("Error", "Could not open camera")
+                return
+
+            sink = open_display_sink("Face Capture", timeout=HEADLESS_DIALOG_TIMEOUT)
+            try:
+                face_encoding, face_crop = capture_face_encoding(source, sink, get_face_backend(model_id),
+                                                                 stop_when_found=not sink.interactive)
+            finally:
+                source.release()
+                sink.close()
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to capture face: {str(e)}")
+            return
+
+        if face_encoding is None:
+            messagebox.showerror("Error", "No face detected. Please try again.")
+            self.status_bar.config(text="Face not captured")
+            return
+
+        def on_saved(message):
+            messagebox.showinfo("Recapture Face", message)
+            self.status_bar.config(text=message)
+
+        self.db.submit("recapture_face", enrollment_number, face_encoding, face_crop,
+                       callback=on_saved,
+                       owner=self.root,
+                       invalidates=("students",))
+
     def mark_attendance(self):
         if self.role == "student":
             try:
@@ -697,123 +2928,87 @@ class AttendanceApp:
                     messagebox.showerror("Error", "Could not detect location. Please check your internet connection.")
                     return
                 
-                cursor = self.tracker.conn.execute('''
-                SELECT hostel_location, face_encoding 
-                FROM students 
-                WHERE enrollment_number = ?
-                ''', (self.enrollment_number,))
-                student_data = cursor.fetchone()
-                
-                if not student_data:
-                    messagebox.showerror("Error", f"Student with enrollment number {self.enrollment_number} not found in database")
-                    return
-                
-                registered_location = student_data[0]
-                stored_face_encoding = student_data[1]
-                
-                if not stored_face_encoding:
-                    messagebox.showerror("Error", "No face data found for this student. Please register your face first.")
-                    return
-                
-                if current_location.lower() != registered_location.lower():
-                    messagebox.showerror("Error", 
-                                       f"Location mismatch!\nCurrent: {current_location}\nRegistered: {registered_location}")
-                    return
-                
-                cap = cv2.VideoCapture(0)
-                if not cap.isOpened():
-                    messagebox.showerror("Error", "Could not open camera")
-                    return
-                
-                cv2.namedWindow("Face Verification", cv2.WINDOW_NORMAL)
-                cv2.resizeWindow("Face Verification", 640, 480)
-                
-                face_verified = False
-                
-                try:
-                    stored_encoding = pickle.loads(bytes(stored_face_encoding))
-                except Exception as e:
-                    print(f"Error loading face data: {e}")
-                    messagebox.showerror("Error", "Failed to load stored face data. Please register your face again.")
-                    cap.release()
-                    cv2.destroyAllWindows()
-                    return
-                
-                while True:
-                    ret, frame = cap.read()
-                    if not ret:
-                        break
-                    
-                    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    
-                    face_locations = face_recognition.face_locations(rgb_frame)
-                    
-                    if face_locations:
-                        top, right, bottom, left = face_locations[0]
-                        cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
-                        
-                        current_face_encoding = face_recognition.face_encodings(rgb_frame, face_locations)[0]
-                        
-                        matches = face_recognition.compare_faces([stored_encoding], current_face_encoding)
-                        if matches[0]:
-                            face_verified = True
-                            cv2.putText(frame, "Face Verified", (left, top - 10),
-                                      cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-                            break
-                        else:
-                            cv2.putText(frame, "Face Not Recognized", (left, top - 10),
-                                      cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
-                    
-                    cv2.imshow("Face Verification", frame)
-                    
-                    if cv2.waitKey(1) & 0xFF == ord('q'):
-                        break
-                
-                cap.release()
-                cv2.destroyAllWindows()
-                
-                if face_verified:
-                    try:
-                        date = datetime.now().strftime("%Y-%m-%d")
-                        cursor = self.tracker.conn.execute('''
-                        SELECT COUNT(*) FROM attendance 
-                        WHERE enrollment_number = ? AND date = ?
-                        ''', (self.enrollment_number, date))
-                        already_marked = cursor.fetchone()[0] > 0
-                        
-                        if already_marked:
-                            messagebox.showinfo("Info", "Attendance already marked for today!")
-                            return
-                        
-                        self.tracker.conn.execute('''
-                        INSERT INTO attendance (enrollment_number, date) 
-                        VALUES (?, ?)
-                        ''', (self.enrollment_number, date))
-                        self.tracker.conn.commit()
-                        messagebox.showinfo("Success", "Attendance marked successfully!")
-                        self.status_bar.config(text=f"Attendance marked for student {self.enrollment_number}")
-                    except sqlite3.Error as e:
-                        messagebox.showerror("Database Error", f"Failed to mark attendance: {str(e)}")
-                        self.tracker.conn.rollback()
-                else:
-                    messagebox.showerror("Error", "Face verification failed. Please try again.")
+                self.status_bar.config(text="Loading face data...")
+                self.db.submit("get_student_face_data", self.enrollment_number,
+                               callback=lambda student_data: self.verify_and_mark(current_location, student_data),
+                               owner=self.root)
                 
             except Exception as e:
                 print(f"Attendance marking error: {e}")  # Add debug print
                 messagebox.showerror("Error", f"Failed to mark attendance: {str(e)}")
                 self.status_bar.config(text="Failed to mark attendance")
-                try:
-                    cap.release()
-                    cv2.destroyAllWindows()
-                except:
-                    pass
+
+    def verify_and_mark(self, current_location, student_data):
+        try:
+            if not student_data:
+                messagebox.showerror("Error", f"Student with enrollment number {self.enrollment_number} not found in database")
+                return
+            
+            if not student_data[2]:
+                messagebox.showerror("Error", "This student account has been deactivated. Please contact the warden.")
+                return
+            
+            registered_location = student_data[0]
+            stored_face_encoding = student_data[1]
+            model_id = student_data[3]
+            
+            if not stored_face_encoding:
+                messagebox.showerror("Error", "No face data found for this student. Please register your face first.")
+                return
+            
+            if current_location.lower() != registered_location.lower():
+                messagebox.showerror("Error", 
+                                   f"Location mismatch!\nCurrent: {current_location}\nRegistered: {registered_location}")
+                return
+            
+            try:
+                stored_encoding = pickle.loads(bytes(stored_face_encoding))
+            except Exception as e:
+                print(f"Error loading face data: {e}")
+                messagebox.showerror("Error", "Failed to load stored face data. Please register your face again.")
+                return
+            
+            source = open_frame_source()
+            if not source.isOpened():
+                messagebox.showerror("Error", "Could not open camera")
+                return
+            
+            sink = open_display_sink("Face Verification", timeout=HEADLESS_DIALOG_TIMEOUT)
+            try:
+                face_verified = verify_face(source, sink, get_face_backend(model_id), stored_encoding)
+            finally:
+                source.release()
+                sink.close()
+            
+            if face_verified:
+                def on_marked(marked):
+                    if not marked:
+                        messagebox.showinfo("Info", "Attendance already marked for today!")
+                        return
+                    messagebox.showinfo("Success", "Attendance marked successfully!")
+                    self.status_bar.config(text=f"Attendance marked for student {self.enrollment_number}")
+
+                self.db.submit("mark_attendance_once", self.enrollment_number,
+                               callback=on_marked,
+                               errback=lambda e: messagebox.showerror("Database Error", f"Failed to mark attendance: {str(e)}"),
+                               owner=self.root)
+            else:
+                messagebox.showerror("Error", "Face verification failed. Please try again.")
+            
+        except Exception as e:
+            print(f"Attendance marking error: {e}")  # Add debug print
+            messagebox.showerror("Error", f"Failed to mark attendance: {str(e)}")
+            self.status_bar.config(text="Failed to mark attendance")
 
     def view_attendance(self):
         enrollment_number = simpledialog.askstring("View Attendance", "Enter Enrollment Number to view attendance:")
         if enrollment_number:
-            message = self.tracker.view_attendance(enrollment_number)
-            self.show_records_window(f"Attendance Records - Enrollment Number: {enrollment_number}", message)
-            self.status_bar.config(text=f"Viewing attendance for student {enrollment_number}")
+            def on_loaded(message):
+                self.show_records_window(f"Attendance Records - Enrollment Number: {enrollment_number}", message)
+                self.status_bar.config(text=f"Viewing attendance for student {enrollment_number}")
+
+            self.status_bar.config(text=f"Loading attendance for student {enrollment_number}...")
+            self.db.submit("view_attendance", enrollment_number, callback=on_loaded, owner=self.root)
 
     def show_records_window(self, title, records):
         records_window = tk.Toplevel(self.root)
@@ -854,7 +3049,9 @@ class AttendanceApp:
         close_button.pack(pady=10)
 
     def view_all_students(self):
-        students = self.tracker.view_all_students()
+        self.db.submit("view_all_students", callback=self.show_students_window, owner=self.root, cache_key="students")
+
+    def show_students_window(self, students):
         if not students:
             messagebox.showinfo("Student Details", "No students registered yet.")
             return
@@ -934,15 +3131,90 @@ class AttendanceApp:
         
         if messagebox.askyesno("Confirm Delete", 
                              f"Are you sure you want to delete student {name} (Enrollment: {enrollment_number})?\nThis action cannot be undone."):
-            if self.tracker.delete_student(enrollment_number):
-                messagebox.showinfo("Success", f"Student {name} has been deleted successfully")
-                tree.delete(selected_item)
+            def on_deleted(deleted):
+                if deleted:
+                    messagebox.showinfo("Success", f"Student {name} has been deleted successfully")
+                    tree.delete(selected_item)
+                else:
+                    messagebox.showerror("Error", "Failed to delete student")
+
+            self.db.submit("delete_student", enrollment_number,
+                           callback=on_deleted,
+                           owner=window,
+                           invalidates=("students",))
+
+    def open_roll_call(self):
+        RollCallWindow(self.root, self.db)
+        self.status_bar.config(text="Live roll call opened")
+
+    def manage_cohort(self):
+        cohort_window = tk.Toplevel(self.root)
+        cohort_window.title("Manage Cohort")
+        cohort_window.geometry("450x520")
+        cohort_window.configure(bg="#f0f0f0")
+
+        main_frame = ttk.Frame(cohort_window, padding="20")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+
+        ttk.Label(main_frame, text="Select students by:").pack(anchor=tk.W)
+        selector_var = tk.StringVar(value="prefix")
+        ttk.Radiobutton(main_frame, text="Enrollment number prefix", variable=selector_var, value="prefix").pack(anchor=tk.W)
+        ttk.Radiobutton(main_frame, text="Hostel location", variable=selector_var, value="hostel").pack(anchor=tk.W)
+        ttk.Radiobutton(main_frame, text="List of enrollment numbers", variable=selector_var, value="list").pack(anchor=tk.W)
+
+        ttk.Label(main_frame, text="Prefix, hostel, or one enrollment number per line:").pack(anchor=tk.W, pady=(10, 0))
+        value_text = tk.Text(main_frame, height=8, font=("Helvetica", 10))
+        value_text.pack(fill=tk.X, pady=5)
+
+        ttk.Label(main_frame, text="Action:").pack(anchor=tk.W)
+        action_var = tk.StringVar(value="deactivate")
+        ttk.Radiobutton(main_frame, text="Deactivate", variable=action_var, value="deactivate").pack(anchor=tk.W)
+        ttk.Radiobutton(main_frame, text="Archive (keep attendance history)", variable=action_var, value="archive").pack(anchor=tk.W)
+        ttk.Radiobutton(main_frame, text="Delete with attendance", variable=action_var, value="delete").pack(anchor=tk.W)
+
+        def apply_action():
+            value = value_text.get("1.0", tk.END).strip()
+            if not value:
+                messagebox.showerror("Error", "Please enter a prefix, hostel or enrollment numbers")
+                return
+
+            selector = selector_var.get()
+            if selector == "prefix":
+                kwargs = {"prefix": value}
+            elif selector == "hostel":
+                kwargs = {"hostel": value}
             else:
-                messagebox.showerror("Error", "Failed to delete student")
+                kwargs = {"enrollment_numbers": [line.strip() for line in value.splitlines() if line.strip()]}
+
+            action = action_var.get()
+            if not messagebox.askyesno("Confirm", f"Are you sure you want to {action} this cohort?", parent=cohort_window):
+                return
+
+            def on_done(counts):
+                summary = ", ".join(f"{count} {table}" for table, count in counts.items())
+                messagebox.showinfo("Success", f"Cohort {action} complete: {summary}", parent=cohort_window)
+                self.status_bar.config(text=f"Cohort {action}: {summary}")
+
+            self.status_bar.config(text=f"Running cohort {action}...")
+            self.db.submit(f"{action}_cohort",
+                           callback=on_done,
+                           errback=lambda e: messagebox.showerror("Error", f"Cohort {action} failed: {str(e)}", parent=cohort_window),
+                           owner=cohort_window,
+                           invalidates=("students",),
+                           **kwargs)
+
+        apply_button = tk.Button(main_frame,
+                               text="Apply",
+                               command=apply_action,
+                               bg="#d32f2f",
+                               fg="white",
+                               font=("Helvetica", 10, "bold"),
+                               padx=20,
+                               pady=10)
+        apply_button.pack(pady=20)
 
     def close(self):
-        self.tracker.close_connection()
-        self.root.quit()
+        self.shell.close()
 
     def get_current_location(self):
         try:
@@ -955,8 +3227,213 @@ class AttendanceApp:
             print(f"Error getting location: {e}")
             return None
 
-if __name__ == "__main__":
-    root = tk.Tk()
+def run_gui(args):
+    AppShell(tk.Tk()).run()
+
+def run_sync(args):
+    tracker = AttendanceTracker()
+    try:
+        applied, skipped, exported = tracker.sync_with(args.directory, args.relay)
+        print(f"Applied {applied} changes, skipped {skipped} already known.")
+        print(f"Exported bundle: {exported}" if exported else "Nothing new to export.")
+    finally:
+        tracker.close_connection()
+
+def run_archive(args):
+    tracker = AttendanceTracker()
+    try:
+        months, moved = tracker.archive_attendance(args.before)
+        if months:
+            print(f"Archived {moved} attendance records from {', '.join(months)}.")
+        else:
+            print("No closed months to archive.")
+    finally:
+        tracker.close_connection()
+
+def run_benchmark(args):
+    people = load_benchmark_images(args.image_dir)
+    if not people:
+        print(f"No people with at least two images found in {args.image_dir}")
+        return
+
+    print(f"{'Backend':<14}{'Enrolled':>9}{'Frames':>8}{'Mean ms':>10}{'P95 ms':>10}{'Detected':>10}{'Accuracy':>10}")
+    for name in args.backend or list(FACE_BACKENDS):
+        try:
+            backend = get_face_backend(name)
+        except (RuntimeError, ValueError) as e:
+            print(f"{name:<14} skipped: {e}")
+            continue
+        result = benchmark_face_backend(backend, people)
+        print(f"{result['backend']:<14}{result['enrolled']:>9}{result['frames']:>8}"
+              f"{result['mean_ms']:>10.1f}{result['p95_ms']:>10.1f}"
+              f"{result['detection_rate']:>10.1%}{result['accuracy']:>10.1%}")
+
+def run_presence(args):
+    tracker = AttendanceTracker()
+    try:
+        matrix = tracker.load_attendance_matrix(rebuild=args.rebuild)
+        day = args.date or datetime.now().strftime("%Y-%m-%d")
+        if args.streak:
+            start = (datetime.strptime(day, "%Y-%m-%d") - timedelta(days=args.days - 1)).strftime("%Y-%m-%d")
+            streaks = matrix.consecutive_absentees(args.streak, start, day, hostel=args.hostel)
+            print(f"{len(streaks)} students missed {args.streak}+ consecutive nights between {start} and {day}:")
+            for enrollment_number, nights in streaks:
+                print(f"  {enrollment_number}  {nights} nights")
+        else:
+            absent = matrix.absentees(day, hostel=args.hostel)
+            print(f"{len(absent)} students absent on {day}:")
+            for enrollment_number in absent:
+                print(f"  {enrollment_number}")
+    finally:
+        tracker.close_connection()
+
+def run_replay(args):
+    backend = get_face_backend(args.backend)
+    source = open_frame_source(args.source)
+    if not source.isOpened():
+        print(f"Could not open frame source {args.source}")
+        return
+    try:
+        result = measure_throughput(source, backend, args.max_frames)
+    finally:
+        source.release()
+    print(f"Backend: {backend.name}")
+    print(f"Frames: {result['frames']} ({result['frames_with_faces']} with faces) in {result['seconds']:.2f}s")
+    print(f"Throughput: {result['fps']:.1f} fps, mean {result['mean_ms']:.1f} ms, p95 {result['p95_ms']:.1f} ms per frame")
+
+def run_kiosk(args):
+    hostel = args.hostel or os.environ.get("ATTEASE_KIOSK_HOSTEL")
+    if not hostel:
+        print("Pass --hostel or set ATTEASE_KIOSK_HOSTEL to the hostel this kiosk serves.")
+        return
+
     tracker = AttendanceTracker()
-    login_window = LoginWindow(root, tracker)
-    root.mainloop()
+    source = open_frame_source(args.source)
+    sink = open_display_sink("Attendance Kiosk")
+    try:
+        if args.rebuild_gallery:
+            tracker.face_gallery.rebuild(tracker)
+        loaded = tracker.face_gallery.load(hostel, tracker)
+        print(f"Loaded {loaded} face encodings for {hostel}")
+
+        def on_match(enrollment_number, home_hostel):
+            if not home_hostel:
+                print(f"Recognised {enrollment_number} from another hostel; attendance not marked")
+            elif tracker.mark_attendance_once(enrollment_number):
+                print(f"Attendance marked for {enrollment_number}")
+            else:
+                print(f"{enrollment_number} already marked today")
+
+        if not source.isOpened():
+            print("Could not open frame source")
+            return
+        # An explicit --backend pins the model; otherwise follow activations
+        identify_faces(source, sink, get_face_backend(args.backend or tracker.active_face_model()), tracker.face_gallery, hostel,
+                       on_match, cross_hostel=args.cross_hostel,
+                       active_model=None if args.backend else tracker.active_face_model)
+    finally:
+        source.release()
+        sink.close()
+        tracker.close_connection()
+
+def run_audit(args):
+    tracker = AttendanceTracker()
+    try:
+        threshold = args.threshold if args.threshold is not None else tracker.duplicate_face_tolerance()
+        checked, report = tracker.audit_duplicate_faces(threshold, args.block_size, args.output)
+        print(f"Checked {checked} encodings, found {len(report)} suspect pairs (distance <= {threshold}).")
+        for row in report[:args.top]:
+            print(f"{row[0]:>4}. {row[1]:.4f}  {row[2]} ({row[3]}, {row[4]})  <->  {row[5]} ({row[6]}, {row[7]})")
+        if args.output:
+            print(f"Full report written to {args.output}")
+    finally:
+        tracker.close_connection()
+
+def run_reencode(args):
+    tracker = AttendanceTracker()
+    try:
+        encoded, failed, without_samples = tracker.reencode_faces(args.model, args.workers, args.checkpoint_every)
+        print(f"Encoded {encoded} students for {args.model}.")
+        for enrollment_number, error in failed:
+            print(f"  Failed {enrollment_number}: {error}")
+        if without_samples:
+            print(f"{without_samples} students have no stored face crop and must be re-captured in person.")
+        if args.activate:
+            uncovered = tracker.activate_face_model(args.model, force=args.force)
+            print(f"Active face model is now {args.model}.")
+            if uncovered:
+                print(f"{len(uncovered)} students have no face data for it; use Recapture Face for:")
+                for enrollment_number in uncovered:
+                    print(f"  {enrollment_number}")
+    except ValueError as e:
+        print(e)
+    finally:
+        tracker.close_connection()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Hostel Attendance System")
+    subparsers = parser.add_subparsers(dest="command")
+
+    sync_parser = subparsers.add_parser("sync", help="exchange changelog bundles with a shared directory")
+    sync_parser.add_argument("directory", help="directory standing in for the remote node")
+    sync_parser.add_argument("--relay", action="store_true",
+                             help="also re-publish changes imported from other nodes (central node only)")
+    sync_parser.set_defaults(func=run_sync)
+
+    archive_parser = subparsers.add_parser("archive", help="move closed months of attendance into archive files")
+    archive_parser.add_argument("--before", help="archive months before this date (YYYY-MM-DD), default today")
+    archive_parser.set_defaults(func=run_archive)
+
+    benchmark_parser = subparsers.add_parser("benchmark-backends", help="compare face backends on a local image set")
+    benchmark_parser.add_argument("image_dir", help="directory with one sub-directory of images per person")
+    benchmark_parser.add_argument("--backend", action="append", choices=list(FACE_BACKENDS),
+                                  help="backend to benchmark (repeatable), default all")
+    benchmark_parser.set_defaults(func=run_benchmark)
+
+    presence_parser = subparsers.add_parser("presence", help="absentee and absence-streak reports")
+    presence_parser.add_argument("--date", help="day to report on (YYYY-MM-DD), default today")
+    presence_parser.add_argument("--hostel", help="only students registered at this hostel location")
+    presence_parser.add_argument("--streak", type=int, help="list students with at least this many consecutive absences")
+    presence_parser.add_argument("--days", type=int, default=30, help="window for --streak, default 30 days")
+    presence_parser.add_argument("--rebuild", action="store_true", help="ignore the saved snapshot and rebuild it")
+    presence_parser.set_defaults(func=run_presence)
+
+    replay_parser = subparsers.add_parser("replay", help="measure recognition throughput headlessly on a frame source")
+    replay_parser.add_argument("source", help="camera index, video file, image directory or synthetic[:N]")
+    replay_parser.add_argument("--backend", choices=list(FACE_BACKENDS), help="face backend, default ATTEASE_FACE_BACKEND")
+    replay_parser.add_argument("--max-frames", type=int, help="stop after this many frames")
+    replay_parser.set_defaults(func=run_replay)
+
+    kiosk_parser = subparsers.add_parser("kiosk", help="identify residents at a hostel gate and mark attendance")
+    kiosk_parser.add_argument("--hostel", help="hostel location served by this kiosk, default ATTEASE_KIOSK_HOSTEL")
+    kiosk_parser.add_argument("--source", help="frame source, default ATTEASE_FRAME_SOURCE or camera 0")
+    kiosk_parser.add_argument("--backend", choices=list(FACE_BACKENDS), help="face backend, default the active face model")
+    kiosk_parser.add_argument("--cross-hostel", action="store_true",
+                              help="search other hostels when no resident matches")
+    kiosk_parser.add_argument("--rebuild-gallery", action="store_true",
+                              help="regenerate all gallery partitions from the database first")
+    kiosk_parser.set_defaults(func=run_kiosk)
+
+    audit_parser = subparsers.add_parser("audit-faces", help="find the same face registered under several enrollment numbers")
+    audit_parser.add_argument("--threshold", type=float,
+                              help="report pairs closer than this distance, default the kiosk match tolerance")
+    audit_parser.add_argument("--block-size", type=int, default=2048, help="rows per distance block, bounds memory")
+    audit_parser.add_argument("--output", help="write the full ranked report to this CSV file")
+    audit_parser.add_argument("--top", type=int, default=20, help="number of pairs to print, default 20")
+    audit_parser.set_defaults(func=run_audit)
+
+    reencode_parser = subparsers.add_parser("reencode", help="regenerate face encodings from stored crops for a model")
+    reencode_parser.add_argument("model", choices=list(FACE_BACKENDS), help="face model to encode with")
+    reencode_parser.add_argument("--workers", type=int, help="worker processes, default one per CPU")
+    reencode_parser.add_argument("--checkpoint-every", type=int, default=200, help="students per committed batch")
+    reencode_parser.add_argument("--activate", action="store_true",
+                                 help="switch kiosks to the new encodings once every student is covered")
+    reencode_parser.add_argument("--force", action="store_true",
+                                 help="with --activate, switch even if some students must be recaptured")
+    reencode_parser.set_defaults(func=run_reencode)
+
+    args = parser.parse_args(argv)
+    getattr(args, "func", run_gui)(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+pytest.importorskip("face_recognition")
+pytest.importorskip("geocoder")
+
+import atease
+
+
+def make_node(base, name):
+    path = base / name
+    path.mkdir()
+    os.chdir(path)
+    return atease.AttendanceTracker()
+
+
+def test_presence_snapshot_keeps_late_rows_folded_into_archive(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    remote = str(tmp_path / "remote")
+    a = make_node(tmp_path, "a")
+    b = make_node(tmp_path, "b")
+
+    os.chdir(tmp_path / "a")
+    a.register_student("E1", "Ann", "1", "Hostel A", np.ones(128))
+    a.sync_with(remote)
+
+    os.chdir(tmp_path / "b")
+    b.sync_with(remote)
+    b.insert_attendance("E1", "2025-01-05")
+    b.conn.commit()
+    b.load_attendance_matrix()
+    b.archive_attendance("2025-03-01")
+
+    # A row for the archived month arrives late from the other kiosk
+    os.chdir(tmp_path / "a")
+    a.insert_attendance("E1", "2025-01-06")
+    a.log_attendance("E1", "2025-01-06")
+    a.conn.commit()
+    a.sync_with(remote)
+
+    os.chdir(tmp_path / "b")
+    assert atease.AttendanceTracker().sync_with(remote)[0] == 1
+    matrix = atease.AttendanceTracker().load_attendance_matrix()
+    assert list(matrix.present_on("2025-01-05")) == [True]
+    assert list(matrix.present_on("2025-01-06")) == [True]
+
+
+def test_duplicate_face_found_in_hostel_without_partition_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    tracker = atease.AttendanceTracker()
+    rng = np.random.default_rng(0)
+    encoding_a = rng.normal(size=128)
+    encoding_b = rng.normal(size=128) + 5
+    assert "registered successfully" in tracker.register_student("A1", "Ann", "1", "Hostel A", encoding_a)
+    assert "registered successfully" in tracker.register_student("B1", "Bob", "2", "Hostel B", encoding_b)
+
+    # Only the Hostel A kiosk has written its partition
+    for path in os.listdir(tracker.face_gallery.directory):
+        os.remove(os.path.join(tracker.face_gallery.directory, path))
+    tracker.face_gallery = atease.FaceGallery()
+    tracker.face_gallery.load("Hostel A", tracker)
+
+    message = tracker.register_student("C1", "Cal", "3", "Hostel C", encoding_b + 0.001)
+    assert message == "This face is already registered under enrollment number B1."
+
+
+def test_forced_activation_lists_students_and_recapture_restores_them(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    tracker = atease.AttendanceTracker()
+    encoding = np.random.default_rng(1).normal(size=128)
+    tracker.register_student("A1", "Ann", "1", "Hostel A", encoding)
+
+    with pytest.raises(ValueError):
+        tracker.activate_face_model("dlib-cnn")
+    assert tracker.activate_face_model("dlib-cnn", force=True) == ["A1"]
+    assert tracker.active_face_model() == "dlib-cnn"
+    assert tracker.get_student_face_data("A1")[1] is None
+
+    assert tracker.recapture_face("A1", encoding) == "Face updated for Ann (A1)."
+    assert tracker.get_student_face_data("A1")[3] == "dlib-cnn"
+    assert tracker.find_duplicate_face(encoding)[0] == "A1"
+    assert tracker.recapture_face("Z9", encoding) == "Student with enrollment number Z9 not found."